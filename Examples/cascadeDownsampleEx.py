@@ -0,0 +1,62 @@
+""" 
+Prints the stage plans lowpassDownsample.cascadeDownsample uses for downsample factors of 8, 50 and 100,
+times single stage scipy.signal.decimate against cascadeDownsample on a synthetic minute of data 
+(30000 time samples by 2432 channels), compares how well each keeps the amplitude of a pass band tone, and times designing a stage filter with and without the cache.
+
+"""
+
+import numpy as np
+import scipy.signal
+import sys
+sys.path.insert(1, '../SourceCode')
+import lowpassDownsample
+import time
+import warnings
+
+
+if __name__ == '__main__':
+    n_time_samples = 30000
+    n_channels = int(sys.argv[1]) if len(sys.argv) > 1 else 2432
+    sampling_freq = 500
+    factors = [8, 50, 100]
+    runs = 2
+    
+    data = np.random.default_rng(0).standard_normal((n_time_samples, n_channels))
+    
+    for factor in factors:
+        plan = lowpassDownsample.decimationPlan(factor, sampling_freq)
+        print("factor: " + str(factor) + ", stages: " + " x ".join(str(stage[0]) for stage in plan) + ", sampling frequency into each stage: " + ", ".join(str(stage[1]) for stage in plan))
+        
+        t1 = time.perf_counter()
+        with warnings.catch_warnings():
+            #decimate warns about a badly conditioned filter for large factors
+            warnings.simplefilter('ignore')
+            for i in range(runs):
+                single = scipy.signal.decimate(data, factor, ftype="iir", axis=0)
+        single_avg = (time.perf_counter() - t1) / runs
+        
+        t1 = time.perf_counter()
+        for i in range(runs):
+            cascade = lowpassDownsample.cascadeDownsample(data, factor, sampling_freq)
+        cascade_avg = (time.perf_counter() - t1) / runs
+        print("    single stage: " + str(round(single_avg, 3)) + " seconds, cascade: " + str(round(cascade_avg, 3)) + " seconds, speedup: " + str(round(single_avg / cascade_avg, 2)))
+        
+        #unit amplitude tone at 0.4 of the new Nyquist frequency, away from the ends of the record
+        tone_freq = 0.4 * sampling_freq / factor / 2
+        tone = np.sin(2 * np.pi * tone_freq * np.arange(n_time_samples) / sampling_freq)[:, np.newaxis]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            single_tone = scipy.signal.decimate(tone, factor, ftype="iir", axis=0)
+        cascade_tone = lowpassDownsample.cascadeDownsample(tone, factor, sampling_freq)
+        middle = slice(len(cascade_tone) // 4, 3 * len(cascade_tone) // 4)
+        print("    pass band tone amplitude, single stage: " + str(round(float(np.sqrt(2 * np.mean(single_tone[middle] ** 2))), 4)) + ", cascade: " + str(round(float(np.sqrt(2 * np.mean(cascade_tone[middle] ** 2))), 4)))
+    
+    #filter design cost with a cold and a warm cache
+    lowpassDownsample.stageFilter.cache_clear()
+    t1 = time.perf_counter()
+    lowpassDownsample.stageFilter(sampling_freq, 5)
+    cold = time.perf_counter() - t1
+    t1 = time.perf_counter()
+    lowpassDownsample.stageFilter(sampling_freq, 5)
+    warm = time.perf_counter() - t1
+    print("stage filter design: " + str(round(cold * 1e6, 1)) + " microseconds, cached: " + str(round(warm * 1e6, 1)) + " microseconds")
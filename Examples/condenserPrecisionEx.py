@@ -0,0 +1,40 @@
+""" 
+Compares condenser.condmatrix results and run time calculated in float32 against float64 on a
+synthetic minute of data (30000 time samples by 2432 channels).
+
+"""
+
+import numpy as np
+import sys
+sys.path.insert(1, '../SourceCode')
+import condenser
+import time
+
+
+if __name__ == '__main__':
+    n_time_samples = 30000
+    n_channels = 2432
+    time_window = 1000
+    ch_group_size = 100
+    nyq_freq = 250
+    
+    #noise plus a 20 Hz signal, stored as float32 like the treble stream
+    rng = np.random.default_rng(0)
+    t = np.arange(n_time_samples) / (2 * nyq_freq)
+    data = (rng.standard_normal((n_time_samples, n_channels)) + np.sin(2 * np.pi * 20 * t)[:, np.newaxis]).astype(np.float32)
+    
+    num_time_windows = condenser.calc_num_time_win(n_time_samples, time_window)
+    num_sensor_groups = condenser.calc_num_ch_groups(n_channels, ch_group_size)
+    num_freq = condenser.calc_num_freq(n_time_samples, num_time_windows)
+    
+    results = {}
+    for dtype in (np.float64, np.float32):
+        t1 = time.perf_counter()
+        results[dtype] = condenser.condmatrix(data, num_time_windows, time_window, num_sensor_groups, ch_group_size, n_channels - 1, num_freq, nyq_freq, dtype=dtype)
+        print(np.dtype(dtype).name + " time: " + str(round(time.perf_counter() - t1, 3)) + " seconds")
+    
+    names = ('spectral_tensor', 'std_deviations', 'means', 'maximums')
+    for name, arr64, arr32 in zip(names, results[np.float64], results[np.float32]):
+        rel_err = np.abs(arr32 - arr64) / np.max(np.abs(arr64))
+        print(name + " max relative error: " + '{:.2e}'.format(np.max(rel_err)) + ", mean relative error: " + '{:.2e}'.format(np.mean(rel_err)))
+    print("peak frequency float64: " + str(results[np.float64][4]) + " Hz, float32: " + str(results[np.float32][4]) + " Hz")
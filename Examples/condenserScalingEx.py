@@ -0,0 +1,42 @@
+""" 
+Times condenser.condmatrix on a synthetic minute of data (30000 time samples by 2432 channels) 
+with an increasing number of worker threads and prints the speedup over one worker.
+
+"""
+
+import numpy as np
+import sys
+sys.path.insert(1, '../SourceCode')
+import condenser
+import os
+import time
+
+
+if __name__ == '__main__':
+    n_time_samples = 30000
+    n_channels = 2432
+    time_window = 1000
+    ch_group_size = 100
+    nyq_freq = 250
+    runs = 3
+    
+    #largest number of workers to time, defaults to the number of cores
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    
+    data = np.random.default_rng(0).standard_normal((n_time_samples, n_channels))
+    
+    num_time_windows = condenser.calc_num_time_win(n_time_samples, time_window)
+    num_sensor_groups = condenser.calc_num_ch_groups(n_channels, ch_group_size)
+    num_freq = condenser.calc_num_freq(n_time_samples, num_time_windows)
+    
+    workers = 1
+    base_time = None
+    while workers <= max_workers:
+        t1 = time.perf_counter()
+        for i in range(runs):
+            condenser.condmatrix(data, num_time_windows, time_window, num_sensor_groups, ch_group_size, n_channels - 1, num_freq, nyq_freq, workers=workers)
+        avg = (time.perf_counter() - t1) / runs
+        if base_time is None:
+            base_time = avg
+        print("workers: " + str(workers) + ", average time: " + str(round(avg, 3)) + " seconds, speedup: " + str(round(base_time / avg, 2)))
+        workers *= 2
@@ -44,6 +44,10 @@ if __name__ == '__main__':
     #note - datasets are specific to hdf5, may need to be cast to numpy array to use in other functions
     spect = f['spectral_tensor']
     
+    #get peak frequencies of each time window and channel group in Hz, highest peak first
+    peak_freqs = f['peak_frequency_index'][:] * freq_bin_size
+    peak_amps = f['peak_frequency_amplitude']
+    
     #example plot of slice at one time window 
     clip = np.percentile(np.absolute(spect[0,:,:]),99.5)
     fig1 = plt.figure()
@@ -143,4 +147,18 @@ if __name__ == '__main__':
     plt.savefig(path + 'lowpassAndDownsampleFigure.png')
     plt.close()
     
+    #get data downsampled over time and channels (time samples by channels), older files do not have it
+    if 'space_time_downsample' in lpds:
+        st_signal = lpds['space_time_downsample']
+        st_dt = st_signal.attrs['dt']               #time between samples in seconds
+        st_dx = st_signal.attrs['dx']               #distance between channels in m
+        clip = np.percentile(np.absolute(st_signal[:]), 99.5)
+        fig = plt.figure()
+        plt.imshow(st_signal[:].T, aspect='auto', extent=(0, st_signal.shape[0] * st_dt, st_signal.shape[1] * st_dx, 0), vmin=-clip, vmax=clip, cmap='seismic')
+        plt.colorbar()
+        plt.xlabel("Time (s)")
+        plt.ylabel("Distance (m)")
+        plt.savefig(path + 'spaceTimeDownsampleFigure.png')
+        plt.close()
+    
     
@@ -0,0 +1,48 @@
+""" 
+Measures the peak memory (with tracemalloc) and time of lowpass and downsampling a synthetic minute of 
+data (30000 time samples by 2432 channels) the old way, subtracting the channel means and calling 
+runLowpassAndDownsample, against lowpassDownsample.parallelDownsample with the means and an out array.
+The number of channels can be given as the first argument.
+
+"""
+
+import numpy as np
+import sys
+sys.path.insert(1, '../SourceCode')
+import lowpassDownsample
+import time
+import tracemalloc
+
+
+def measure(func):
+    tracemalloc.start()
+    t1 = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - t1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+if __name__ == '__main__':
+    n_time_samples = 30000
+    n_channels = int(sys.argv[1]) if len(sys.argv) > 1 else 2432
+    sampling_freq = 500
+    integerDownsampleFactor = 8
+    
+    data = np.random.default_rng(0).standard_normal((n_time_samples, n_channels)) + 5
+    means = data.mean(axis=0)
+    data_mb = data.nbytes / 1e6
+    
+    def old_path():
+        shift_data = data - means
+        lowpassDownsample.runLowpassAndDownsample(shift_data, n_time_samples / sampling_freq, n_time_samples, sampling_freq, integerDownsampleFactor)
+    
+    def new_path():
+        out = np.empty((n_channels, lowpassDownsample.downsampledLength(n_time_samples, integerDownsampleFactor)))
+        lowpassDownsample.parallelDownsample(data, integerDownsampleFactor, sampling_freq, out=out.T, means=means)
+    
+    print("data: " + str(round(data_mb, 1)) + " MB")
+    for name, func in [("subtract means + runLowpassAndDownsample", old_path), ("parallelDownsample with means and out", new_path)]:
+        peak, elapsed = measure(func)
+        print(name + ": peak " + str(round(peak / 1e6, 1)) + " MB (" + str(round(peak / 1e6 / data_mb, 2)) + "x data), " + str(round(elapsed, 3)) + " seconds")
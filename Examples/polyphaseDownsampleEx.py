@@ -0,0 +1,55 @@
+""" 
+Times scipy.signal.decimate with the IIR filter used by runLowpassAndDownsample against 
+lowpassDownsample.polyphaseDownsample on a synthetic minute of data (30000 time samples by 2432 channels) 
+for downsample factors of 2, 4, 8 and 16, and saves the frequency responses of both filters 
+to figures/polyphaseResponse.png.
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+import scipy.signal
+import sys
+sys.path.insert(1, '../SourceCode')
+import lowpassDownsample
+import time
+plt.switch_backend('agg')
+
+
+if __name__ == '__main__':
+    n_time_samples = 30000
+    n_channels = 2432
+    sampling_freq = 500
+    factors = [2, 4, 8, 16]
+    runs = 2
+    
+    data = np.random.default_rng(0).standard_normal((n_time_samples, n_channels))
+    
+    for factor in factors:
+        t1 = time.perf_counter()
+        for i in range(runs):
+            scipy.signal.decimate(data, factor, ftype="iir", axis=0)
+        iir_avg = (time.perf_counter() - t1) / runs
+        
+        t1 = time.perf_counter()
+        for i in range(runs):
+            lowpassDownsample.polyphaseDownsample(data, factor)
+        fir_avg = (time.perf_counter() - t1) / runs
+        print("factor: " + str(factor) + ", iir decimate: " + str(round(iir_avg, 3)) + " seconds, polyphase fir: " + str(round(fir_avg, 3)) + " seconds, speedup: " + str(round(iir_avg / fir_avg, 2)))
+    
+    #frequency response of both filters relative to the new Nyquist frequency
+    fig, axs = plt.subplots(len(factors), 1, figsize=(8, 3 * len(factors)))
+    for ax, factor in zip(axs, factors):
+        sos = scipy.signal.cheby1(8, 0.05, 0.8 / factor, output='sos')
+        w, h_iir = scipy.signal.sosfreqz(sos, worN=4096, fs=sampling_freq)
+        w, h_fir = scipy.signal.freqz(lowpassDownsample.polyphaseTaps(factor), worN=4096, fs=sampling_freq)
+        ax.plot(w, 20 * np.log10(np.maximum(np.abs(h_iir), 1e-12)), label='iir decimate')
+        ax.plot(w, 20 * np.log10(np.maximum(np.abs(h_fir), 1e-12)), label='polyphase fir')
+        ax.axvline(sampling_freq / factor / 2, color='k', linestyle='--', linewidth=0.8)
+        ax.set_ylim(-120, 5)
+        ax.set_title('downsample factor ' + str(factor))
+        ax.set_ylabel('Gain [dB]')
+        ax.legend()
+    axs[-1].set_xlabel('Frequency [Hz]')
+    fig.tight_layout()
+    fig.savefig('figures/polyphaseResponse.png')
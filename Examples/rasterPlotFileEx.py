@@ -4,8 +4,8 @@ import scipy.signal
 import sys
 sys.path.insert(1, '../SourceCode')
 import lowpassDownsample
-from scipy.signal import iirfilter, zpk2sos, sosfilt
-import warnings
+import h5py
+import math
 import time
 
 plt.switch_backend('agg')
@@ -13,18 +13,35 @@ plt.switch_backend('agg')
 
 def main(argv):
 	fileName = argv[0]
-	integerDownsampleFactor = 10;
-	#Run lowpass filter and downsample 
-	(time, signal, downsample_time, downsample_signal, sample_freq, downsampled_sample_freq) = lowpassDownsample.runLowpassAndDownsampleWithFile(integerDownsampleFactor,fileName);
-	print(downsample_signal.shape, file=sys.stderr);
-	#img = plt.imshow(downsample_signal, aspect='auto',interpolation='none');
-	#plt.ylabel('Amp')
-	#plt.xlabel('Time')
-	#img = ds.tf.shade(signal, cmap=fire, how='linear')
-#export_image(img, "out", background="black", export_path="figures/")
-	plt.imshow(signal,aspect='auto',interpolation='nearest',vmin=-1*np.percentile(signal,99),vmax=np.percentile(signal,99),cmap='seismic');
+	#about the size in pixels of the raster
+	numRows = 2000;
+	numCols = 1000;
+	with h5py.File(fileName, 'r') as f:
+		(number_time_samples, number_channels) = f['data_product']['data'].shape;
+	binSizes = (math.ceil(number_time_samples / numRows), math.ceil(number_channels / numCols));
+	
+	#reduce the raster one block of time samples at a time, keeping rows that do not fill a bin for the next block
+	#and take a sample of the values of each block for the colour limits
+	t1 = time.perf_counter();
+	rows = [];
+	samples = [];
+	leftover = None;
+	for block in lowpassDownsample.iterFileData(fileName):
+		samples.append(lowpassDownsample.sampleValues(block, math.ceil(100000 * block.shape[0] / number_time_samples), seed=len(samples)));
+		if leftover is not None:
+			block = np.concatenate((leftover, block));
+		full = block.shape[0] - block.shape[0] % binSizes[0];
+		if full > 0:
+			rows.append(lowpassDownsample.rasterReduce(block[:full], binSizes));
+		leftover = block[full:];
+	if leftover is not None and leftover.shape[0] > 0:
+		rows.append(lowpassDownsample.rasterReduce(leftover, binSizes));
+	raster = np.concatenate(rows);
+	clip = np.percentile(np.concatenate(samples), 99);
+	print("reduced " + str((number_time_samples, number_channels)) + " to " + str(raster.shape) + " in " + str(round(time.perf_counter() - t1, 3)) + " seconds", file=sys.stderr);
+	
+	plt.imshow(raster,aspect='auto',interpolation='nearest',vmin=-1*clip,vmax=clip,cmap='seismic',extent=(0, number_channels, number_time_samples, 0));
 	plt.colorbar()
 	plt.savefig('figures/rasterPlot.png');
 if __name__ == "__main__":
 	main(sys.argv[1:])
-
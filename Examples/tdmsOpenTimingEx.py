@@ -0,0 +1,29 @@
+""" 
+Times opening .tdms files and reading their properties with TdmsReader, for example to scan a 
+directory of recordings. Takes a glob of files, e.g. python3 tdmsOpenTimingEx.py "/data/*.tdms"
+
+"""
+
+import sys
+import glob
+import time
+t_import = time.perf_counter()
+sys.path.insert(1, '../SourceCode')
+from Silixa.tdms_reader import TdmsReader
+t_import = time.perf_counter() - t_import
+
+
+if __name__ == '__main__':
+    files = sorted(glob.glob(sys.argv[1]))
+    if not files:
+        sys.exit("No files match " + sys.argv[1])
+    
+    print("import tdms_reader: " + str(round(t_import * 1e3, 1)) + " ms, pandas imported: " + str('pandas' in sys.modules))
+    
+    t1 = time.perf_counter()
+    n_props = 0
+    for fp in files:
+        with TdmsReader(fp) as tdms:
+            n_props += len(tdms.get_properties())
+    elapsed = time.perf_counter() - t1
+    print(str(len(files)) + " files, " + str(n_props) + " properties, " + str(round(elapsed / len(files) * 1e3, 3)) + " ms per file")
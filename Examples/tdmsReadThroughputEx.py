@@ -0,0 +1,37 @@
+""" 
+Measures the read throughput of TdmsReader.get_data copying the data against returning views of the 
+memory map (copy=False). The file is read in blocks of time samples (by default the chunk size of the file)
+and every block is summed so the pages are read in both modes. 
+Usage: python3 tdmsReadThroughputEx.py file.tdms [block_samples]
+
+"""
+
+import sys
+import time
+sys.path.insert(1, '../SourceCode')
+from Silixa.tdms_reader import TdmsReader
+
+
+if __name__ == '__main__':
+    file_path = sys.argv[1]
+    runs = 3
+    
+    with TdmsReader(file_path) as tdms:
+        n_samples = tdms.channel_length
+        n_channels = tdms.fileinfo['n_channels']
+        block_samples = int(sys.argv[2]) if len(sys.argv) > 2 else tdms._chunk_size
+        mbytes = n_samples * n_channels * tdms.get_data(0, 0, 0, 0).itemsize / 1e6
+        print(str(n_samples) + " samples by " + str(n_channels) + " channels, " + str(round(mbytes, 1)) + " MB, blocks of " + str(block_samples) + " samples")
+        
+        for copy in (True, False):
+            n_copied = 0
+            n_blocks = 0
+            t1 = time.perf_counter()
+            for i in range(runs):
+                for beg in range(0, n_samples, block_samples):
+                    block = tdms.get_data(0, None, beg, beg + block_samples - 1, copy=copy)
+                    block.sum()
+                    n_copied += tdms.last_read_copied
+                    n_blocks += 1
+            elapsed = (time.perf_counter() - t1) / runs
+            print("copy=" + str(copy) + ": " + str(round(mbytes / elapsed, 1)) + " MB/s, " + str(n_copied) + " of " + str(n_blocks) + " blocks copied")
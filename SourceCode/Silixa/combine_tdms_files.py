@@ -17,6 +17,7 @@ import sys
 sys.path.insert(1, '..')
 import condenser
 import numpy as np
+import math
 import matplotlib.pyplot as plt
 from Silixa import tdms_params as tp
 from Silixa import tdms_func
@@ -50,8 +51,8 @@ def main(file_paths):
     
     nyq_freq = tp.fs / 2   #nyquist freq
     
-    #change freqs, pare down to smaller avgs
-    num_cond_freqs = int(((tp.time_window / 2) + 1) / tp.bin_size)
+    #change freqs, pare down to smaller avgs, including a smaller last bin for any remainder freqs
+    num_cond_freqs = math.ceil((tp.time_window // 2 + 1) / tp.bin_size)
     
     #get bigger tensor and stats arrays
     big_tens, ch_stds, ch_means, ch_maxs, peak_freqs, means_t, stds_t, maxs_t = tdms_func.combine_data_products(num_files, num_time_windows, num_sensor_groups, num_cond_freqs, file_paths, nyq_freq)
@@ -0,0 +1,253 @@
+""" TDMS File Collection
+
+This module joins a set of .tdms files (Silixa writes one file a minute) into one virtual array of time 
+samples by channels. Files are put in time order using the timestamp in their names, e.g. 
+PSUDAS_UTC_20190426_205443.415.tdms from tdms_func.create_file_names, or a timestamp property in their 
+header. Reads that cross from one file to the next are joined, and open TdmsReaders are kept in a 
+least recently used pool so repeated reads do not reopen the files.
+
+Functions
+---------
+file_name_time - Get the timestamp in a file name
+
+Classes
+-------
+TdmsCollection - Time ordered set of tdms files read as one array
+"""
+
+import os
+import re
+import glob
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from Silixa.tdms_reader import TdmsReader
+
+#date and time in file names, yyyymmdd_hhmmss with optional fractional seconds
+FILE_TIME_PATTERN = re.compile(r'(\d{8})_(\d{6})(\.\d+)?')
+
+
+def file_name_time(file_path):
+    """
+    Get the timestamp in a file name
+    
+    Parameters
+    ----------
+    file_path : string
+        Path of the file, e.g. PSUDAS_UTC_20190426_205443.415.tdms
+    
+    Returns
+    -------
+    datetime
+        Time in the name, or None if the name does not hold one
+    """
+    
+    match = FILE_TIME_PATTERN.search(os.path.basename(file_path))
+    if match is None:
+        return None
+    try:
+        time = datetime.strptime(match.group(1) + match.group(2), '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+    if match.group(3):
+        time = time.replace(microsecond=int(round(float(match.group(3)) * 1e6)) % 1000000)
+    return time
+
+
+def _header_time(file_path):
+    """Time from the first datetime property in the header of a tdms file, GPSTimeStamp if it has one."""
+    
+    with TdmsReader(file_path) as tdms:
+        props = tdms.get_properties()
+    if isinstance(props.get('GPSTimeStamp'), datetime):
+        return props['GPSTimeStamp']
+    for value in props.values():
+        if isinstance(value, datetime):
+            return value
+    return None
+
+
+class TdmsCollection(object):
+    """
+    Time ordered set of tdms files read as one array of time samples by channels
+    
+    Files are ordered by the timestamp in their names, then the timestamp in their headers for files
+    without one in their name, and then by name. Every file must have the same number of channels. 
+    Time sample indexes run on from one file to the next, so get_data and iter_blocks can span any 
+    number of files. Up to max_open files are kept open, closing the least recently used first.
+    
+    Parameters
+    ----------
+    source : string or list
+        Directory (all .tdms files in it), glob pattern, or list of file paths
+    max_open : int
+        Most files to keep open at once
+    use_index : bool
+        Whether the TdmsReaders use segment index files
+    """
+    
+    def __init__(self, source, max_open=8, use_index=True):
+        if isinstance(source, str):
+            if os.path.isdir(source):
+                file_paths = glob.glob(os.path.join(source, '*.tdms'))
+            else:
+                file_paths = glob.glob(source)
+        else:
+            file_paths = list(source)
+        if len(file_paths) == 0:
+            raise ValueError('No tdms files found in ' + str(source))
+        
+        self.max_open = max_open
+        self.use_index = use_index
+        self._readers = OrderedDict()
+        
+        #sort on (has no time, time, name) so files without a time go last in name order
+        times = []
+        for fp in file_paths:
+            time = file_name_time(fp)
+            if time is None:
+                time = _header_time(fp)
+            times.append(time)
+        order = sorted(range(len(file_paths)), key=lambda i: (times[i] is None, times[i] or datetime.min, file_paths[i]))
+        self.file_paths = [file_paths[i] for i in order]
+        self.file_times = [times[i] for i in order]
+        
+        #number of time samples in each file and index of the first sample of each file
+        self.file_lengths = np.zeros(len(self.file_paths), dtype=np.int64)
+        self.n_channels = None
+        for i in range(len(self.file_paths)):
+            reader = self._reader(i)
+            self.file_lengths[i] = reader.channel_length
+            if self.n_channels is None:
+                self.n_channels = reader.fileinfo['n_channels']
+            elif reader.fileinfo['n_channels'] != self.n_channels:
+                raise ValueError(self.file_paths[i] + ' does not have ' + str(self.n_channels) + ' channels')
+        self._file_starts = np.concatenate(([0], np.cumsum(self.file_lengths)))
+        self.channel_length = int(self._file_starts[-1])
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close every open file."""
+        
+        while self._readers:
+            self._readers.popitem(last=False)[1].close()
+    
+    def _reader(self, i):
+        """TdmsReader of file i, opened if it is not in the pool."""
+        
+        if i in self._readers:
+            self._readers.move_to_end(i)
+            return self._readers[i]
+        reader = TdmsReader(self.file_paths[i], use_index=self.use_index)
+        self._readers[i] = reader
+        if len(self._readers) > self.max_open:
+            self._readers.popitem(last=False)[1].close()
+        return reader
+    
+    def get_properties(self):
+        """
+        Properties of the first file
+        
+        Returns
+        -------
+        dict
+            Property names and values
+        """
+        
+        return self._reader(0).get_properties()
+    
+    def get_data(self, first_ch=0, last_ch=None, first_s=0, last_s=None, ch_step=1, s_step=1, channels=None):
+        """
+        Get a block of data from the files
+        
+        Parameters
+        ----------
+        first_ch : int
+            First channel to load
+        last_ch : int
+            Last channel to load (inclusive), the last channel of the files if None
+        first_s : int
+            First time sample to load, counting from the start of the first file
+        last_s : int
+            Last time sample to load (inclusive), the end of the last file if None
+        ch_step : int
+            Load every ch_step-th channel from first_ch
+        s_step : int
+            Load every s_step-th time sample from first_s
+        channels : list
+            Channel indexes to load instead of first_ch to last_ch
+        
+        Returns
+        -------
+        array
+            2D array of data with rows as time samples and columns as channels
+        """
+        
+        if first_s is None or first_s < 0:
+            first_s = 0
+        if last_s is None or last_s >= self.channel_length:
+            last_s = self.channel_length - 1
+        if first_s > last_s:
+            #no samples, but the same number of channels as any other read
+            return self._reader(0).get_data(first_ch, last_ch, 0, -1, ch_step=ch_step, channels=channels)
+        
+        #files holding first_s and last_s
+        first_f = np.searchsorted(self._file_starts, first_s, side='right') - 1
+        last_f = np.searchsorted(self._file_starts, last_s, side='right') - 1
+        
+        blocks = []
+        sample = first_s
+        for i in range(first_f, min(last_f, len(self.file_paths) - 1) + 1):
+            start = self._file_starts[i]
+            if sample > min(last_s, self._file_starts[i + 1] - 1):
+                #step jumps over this file
+                continue
+            block = self._reader(i).get_data(first_ch, last_ch, sample - start, min(last_s, self._file_starts[i + 1] - 1) - start, ch_step=ch_step, s_step=s_step, channels=channels)
+            blocks.append(block)
+            sample += block.shape[0] * s_step
+        
+        if len(blocks) == 1:
+            return blocks[0]
+        return np.concatenate(blocks)
+    
+    def iter_blocks(self, block_samples, channels=None, overlap=0, first_ch=0, last_ch=None, first_s=0, last_s=None):
+        """
+        Generator of consecutive blocks of data across the files, see TdmsReader.iter_blocks
+        
+        Parameters
+        ----------
+        block_samples : int
+            Number of time samples in each block, the last block holds any remainder
+        channels : list
+            Channel indexes to load instead of first_ch to last_ch
+        overlap : int
+            Number of time samples from before each block (except the first) to add to its start
+        first_ch : int
+            First channel to load
+        last_ch : int
+            Last channel to load (inclusive)
+        first_s : int
+            First time sample to load
+        last_s : int
+            Last time sample to load (inclusive)
+        
+        Yields
+        ------
+        array
+            2D array of the next block of data with rows as time samples and columns as channels
+        """
+        
+        if block_samples < 1 or overlap < 0:
+            raise ValueError('block_samples must be at least 1 and overlap at least 0')
+        if first_s is None or first_s < 0:
+            first_s = 0
+        if last_s is None or last_s >= self.channel_length:
+            last_s = self.channel_length - 1
+        for beg in range(first_s, last_s + 1, block_samples):
+            end = min(beg + block_samples, last_s + 1)
+            yield self.get_data(first_ch, last_ch, max(beg - overlap, first_s), end - 1, channels=channels)
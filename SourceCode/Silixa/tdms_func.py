@@ -206,26 +206,26 @@ def combine_data_products(num_files, num_time_windows, num_sensor_groups, num_co
     
     #create big tensor to hold all spectra
     #params same for each file, so tensor bigger lengthwise
-    big_tens = np.zeros((num_files * num_time_windows, num_sensor_groups, num_cond_freqs))
+    big_tens = np.zeros((num_files * num_time_windows, num_sensor_groups, num_cond_freqs), dtype=tp.dtype)
     
     #data products
     
     #standard deviations for channels per each file
     n_channels = tp.last_channel - tp.first_channel + 1
-    ch_stds = np.zeros((num_files, num_time_windows, num_sensor_groups))
+    ch_stds = np.zeros((num_files, num_time_windows, num_sensor_groups), dtype=tp.dtype)
     
-    ch_means = np.zeros((num_files, n_channels))
+    ch_means = np.zeros((num_files, n_channels), dtype=tp.dtype)
     
     #max value for each channel per file
-    ch_maxs = np.zeros((num_files, n_channels))
+    ch_maxs = np.zeros((num_files, n_channels), dtype=tp.dtype)
     
     #peak frequency per file
     peak_freqs = np.zeros(num_files)
     
     #times
-    stds_t = np.zeros((num_files, n_channels))
-    means_t = np.zeros((num_files, n_channels))
-    maxs_t = np.zeros((num_files, n_channels))
+    stds_t = np.zeros((num_files, n_channels), dtype=tp.dtype)
+    means_t = np.zeros((num_files, n_channels), dtype=tp.dtype)
+    maxs_t = np.zeros((num_files, n_channels), dtype=tp.dtype)
     
     #write each of files to cond file
     for i in range(len(file_paths)):
@@ -234,32 +234,36 @@ def combine_data_products(num_files, num_time_windows, num_sensor_groups, num_co
         
         #get tdms reader
         tdms = TdmsReader(fp)
-        #read in tdms data - array of time samples x channels
-        some_data = tdms.get_data(tp.first_channel, tp.last_channel, tp.first_time_sample, tp.last_time_sample)
+        last_s = min(tp.last_time_sample, tdms.channel_length - 1)
+        n_samples = last_s - tp.first_time_sample + 1
         
         #calculate number of frequencies to store
-        num_freq = condenser.calc_num_freq(len(some_data), num_time_windows)
+        num_freq = condenser.calc_num_freq(n_samples, num_time_windows)
         
-        #get condensed matrix
-        spect, std_devs, means, max_vals, peak_freq = condenser.condmatrix(some_data, num_time_windows, tp.time_window, num_sensor_groups, tp.ch_group_size, tp.last_channel, num_freq, nyq_freq)
-        
-        #avg similar frequencies to get smaller number of freq bins and frequencies to store
-        spect = spect.reshape(num_time_windows, num_sensor_groups, num_freq // tp.bin_size, tp.bin_size)
-        spect = np.mean(spect, axis=-1)
-        
-        #store spect in tensor
+        #stream the tdms data (time samples x channels) one time window at a time, so only one window is held in memory
+        stream = condenser.StreamingCondenser(tp.time_window, num_sensor_groups, tp.ch_group_size, tp.last_channel, num_freq, nyq_freq, dtype=tp.dtype)
+        t_stats = condenser.TimeStats(n_channels)
         t_indx = i * num_time_windows
         c_indx = num_sensor_groups
-        big_tens[t_indx:t_indx+spect.shape[0], 0:c_indx, :] = spect
+        for block in tdms.iter_blocks(tp.time_window, first_ch=tp.first_channel, last_ch=tp.last_channel, first_s=tp.first_time_sample, last_s=last_s):
+            t_stats.update(block)
+            #only the first num_time_windows windows go in the tensor
+            if stream.n_windows == num_time_windows:
+                continue
+            spect, std_devs = stream.push(block)
+            
+            #store spect rows in tensor
+            #avg similar frequencies to get smaller number of freq bins and frequencies to store
+            w_indx = stream.n_windows - spect.shape[0]
+            big_tens[t_indx+w_indx:t_indx+stream.n_windows, 0:c_indx, :] = condenser.reduce_bins(spect, tp.bin_size, axis=-1)
+            ch_stds[i, w_indx:stream.n_windows, :] = std_devs
         
-        #store stats in respective arrays
-        ch_stds[i, :, :] = std_devs
-        ch_means[i, :] = means
+        #store stats in respective arrays, means are over all the time samples read
+        means, max_vals, peak_freq = stream.result()
+        ch_means[i, :] = means * (stream.n_samples / n_samples)
         ch_maxs[i, :] = max_vals
         peak_freqs[i] = peak_freq
         
-        means_t[i, :] = condenser.mean_time(some_data)
-        stds_t[i, :] = condenser.std_dev_time(some_data)
-        maxs_t[i, :] = condenser.max_time(some_data)
+        means_t[i, :], stds_t[i, :], maxs_t[i, :] = t_stats.mean, t_stats.std, t_stats.max
     
     return big_tens, ch_stds, ch_means, ch_maxs, peak_freqs, means_t, stds_t, maxs_t
@@ -30,5 +30,8 @@ ch_group_size = 100
 #num time samples must be divisible by time_window
 time_window = 1000 
 
-#define bin size to group similar freqs together, should be even divide (no remainder) of num freq aka time_window/2 + 1 - holds for ntimesamples != 30000?
-bin_size = 3
\ No newline at end of file
+#define bin size to group similar freqs together, if it does not evenly divide num freq aka time_window/2 + 1 the last bin averages the remainder freqs
+bin_size = 3
+
+#floating point precision used to calculate and save the data products, 'float32' halves the memory and fft cost
+dtype = 'float64'
\ No newline at end of file
@@ -21,12 +21,13 @@ Ref:    [1] TDMS_Adv_Read.m
 
 """
 
-import os, struct, datetime
-import pandas as pd
+import os, struct, datetime, json
 import numpy as np
 import mmap
 
 def load_property_map(xls_file):
+    # pandas is only needed here, importing it at the top would slow down opening every file
+    import pandas as pd
     prop_map = pd.read_excel(xls_file, sheetname='Sheet1')
     return prop_map[['CurrentTag', 'CorrectTag']].applymap(lambda x: x.replace(" ", "")).set_index('CurrentTag').to_dict()['CorrectTag']
 
@@ -82,32 +83,57 @@ TDS_DATA_TYPE = dict({
     0xFFFFFFFF: 'raw'               # tdsTypeDAQmxRawData    
 })
 
-# Function mapping for reading TDMS data types
-TDS_READ_VAL = dict({
-    'void': lambda f: None, # tdsTypeVoid
-    'int8': lambda f: struct.unpack('<b', f.read(1))[0],
-    'int16': lambda f: struct.unpack('<h', f.read(2))[0],
-    'int32': lambda f: struct.unpack('<i', f.read(4))[0],
-    'int64': lambda f: struct.unpack('<q', f.read(8))[0],
-    'uint8': lambda f: struct.unpack('<B', f.read(1))[0],
-    'uint16': lambda f: struct.unpack('<H', f.read(2))[0],
-    'uint32': lambda f: struct.unpack('<I', f.read(4))[0],
-    'uint64': lambda f: struct.unpack('<Q', f.read(8))[0],
-    'float32': lambda f: struct.unpack('<f', f.read(4))[0],
-    'float64': lambda f: struct.unpack('<d', f.read(8))[0],
-    'float128': type_not_supported,
-    'singleFloatWithUnit': type_not_supported,
-    'doubleFloatWithUnit': type_not_supported,
-    'extendedFloatWithUnit': type_not_supported,
-    'str': lambda f: f.read(struct.unpack('<i', f.read(4))[0]),
-    'bool': lambda f: struct.unpack('<?', f.read(1))[0],
-    'datetime': lambda f: parse_time_stamp(
-        struct.unpack('<Q', f.read(8))[0], struct.unpack('<q', f.read(8))[0]),
-    'raw': type_not_supported
+# Struct formats of the fixed size TDM data types, for unpacking values from the header buffer
+TDS_STRUCT_FMT = dict({
+    'int8': '<b',
+    'int16': '<h',
+    'int32': '<i',
+    'int64': '<q',
+    'uint8': '<B',
+    'uint16': '<H',
+    'uint32': '<I',
+    'uint64': '<Q',
+    'float32': '<f',
+    'float64': '<d',
+    'bool': '<?',
 })
 
+
+def unpack_property(buf, pos):
+    """
+    Unpack a single property from a buffer of the TDMS header.
+    buf -- bytes of the header
+    pos -- offset in buf of the start of the property
+    Return the name, type and value of the property and the offset after it.
+    """
+    (var,) = struct.unpack_from('<i', buf, pos)
+    name = buf[pos + 4:pos + 4 + var].decode()
+    pos += 4 + var
+    (data_type,) = struct.unpack_from('<i', buf, pos)
+    pos += 4
+    type_name = TDS_DATA_TYPE[data_type]
+    if type_name in TDS_STRUCT_FMT:
+        fmt = TDS_STRUCT_FMT[type_name]
+        value = struct.unpack_from(fmt, buf, pos)[0]
+        pos += struct.calcsize(fmt)
+    elif type_name == 'str':
+        (var,) = struct.unpack_from('<i', buf, pos)
+        value = buf[pos + 4:pos + 4 + var].decode()
+        pos += 4 + var
+    elif type_name == 'datetime':
+        value = parse_time_stamp(*struct.unpack_from('<Qq', buf, pos))
+        pos += 16
+    elif type_name == 'void':
+        value = None
+    else:
+        type_not_supported(type_name)
+    return name, data_type, value, pos
+
+
 DECIMATE_MASK = 0b00100000
 LEAD_IN_LENGTH = 28
+# Version of the layout of the segment index files, older index files are ignored and rewritten
+INDEX_VERSION = 1
 FILEINFO_NAMES = ('file_tag',
                   'toc',
                   'version',
@@ -116,23 +142,32 @@ FILEINFO_NAMES = ('file_tag',
 
 
 class TdmsReader(object):
-    """A TDMS file reader object for reading properties and data"""
+    """
+    A TDMS file reader object for reading properties and data
 
-    def __init__(self, filename):
+    The segments of the file are found the first time data is read, by walking the lead in of
+    every segment, and saved in an index file next to the TDMS file (filename + '.index.json').
+    Opening the file again uses the index instead of walking the segments, unless the size or
+    modification time of the file has changed. use_index=False never reads or writes the index.
+    """
+
+    def __init__(self, filename, use_index=True):
         self._properties = None
+        self._property_list = None
+        self._metadata = None
         self._end_of_properties_offset = None
         self._data_type = None
         self._chunk_size = None
 
-        self._raw_data = None
-        self._raw_data2 = None # The mapped data in the 'Next Segment'
-        self._raw_last_chunk = None
-        self._raw2_last_chunk = None
+        self.use_index = use_index
+        self._segments = None # [raw data offset, samples, decimated] of each segment
+        self._pieces = None # [first sample, offset, samples, sample major] of each contiguous piece of data
+        self._dmap = None
+        # Whether the last get_data had to copy the data (False if it returned a view)
+        self.last_read_copied = None
 
         self.file_size = os.path.getsize(filename)
         self._channel_length = None
-        self._seg1_length = None
-        self._seg2_length = None
 
         #TODO: Error if file not big enough to hold header
         self._tdms_file = open(filename, 'rb')
@@ -145,7 +180,7 @@ class TdmsReader(object):
         #TODO: validate file
         if fields[0].decode() not in 'TDSm':
             msg = "Not a TDMS file (TDSm tag not found)"
-            raise(TypeError, msg)
+            raise TypeError(msg)
 
         self.fileinfo = dict(zip(FILEINFO_NAMES, fields))
         self.fileinfo['decimated'] = not bool(self.fileinfo['toc'] &
@@ -164,10 +199,14 @@ class TdmsReader(object):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the file, views already returned by get_data stay valid."""
         self._tdms_file.close()
 
     def _get_channel_length(self):
-        if not self._channel_length:
+        if self._channel_length is None:
             self._initialise_data()
 
         return self._channel_length
@@ -182,8 +221,7 @@ class TdmsReader(object):
         if self._properties is None:
             self._properties = self._read_properties()
         if mapped:
-            props = self._properties.copy()
-            tmp = [prop_map.get(col.replace(" ", ""),col.replace(" ", "")) for col in self._properties.index]
+            tmp = [prop_map.get(name.replace(" ", ""),name.replace(" ", "")) for name, _, _ in self._property_list]
             tmp1 = []
             def addToList(ls, val, cnt=0):
                 if val not in ls:
@@ -198,88 +236,81 @@ class TdmsReader(object):
             for col in tmp:
                 addToList(tmp1, col)
 
-            props.index = tmp1
-            return props.loc[:,'Value'].to_dict()
+            return dict(zip(tmp1, [value for _, _, value in self._property_list]))
         else:
-            return self._properties.loc[:,'Value'].to_dict()
+            return self._properties.copy()
 
-    def _read_property(self):
-        """ 
-        Read a single property from the TDMS file. 
-        Return the name, type and value of the property as a list.
-        """
-        # Read length of object path:
-        var = struct.unpack('<i', self._tdms_file.read(4))[0]
-        # Read property name and type:
-        name, data_type = struct.unpack('<{0}si'.format(var),
-                                        self._tdms_file.read(var + 4))
-        # Lookup function to read and parse property value based on type:
-        value = TDS_READ_VAL[TDS_DATA_TYPE[data_type]](self._tdms_file)
-        name = name.decode()
-        if data_type == 32:
-            value = value.decode()
-
-        return name, data_type, value
+    def _read_metadata(self):
+        """Read the whole header (between the lead in and the raw data) in one read."""
+        if self._metadata is None:
+            self._tdms_file.seek(LEAD_IN_LENGTH, 0)
+            self._metadata = self._tdms_file.read(self.fileinfo['raw_data_offset'] - LEAD_IN_LENGTH)
+        return self._metadata
 
     def _read_properties(self):
-        """Read the properties from the file"""
-        self._tdms_file.seek(LEAD_IN_LENGTH, 0)
+        """Read the properties from the header buffer"""
+        meta = self._read_metadata()
         # Number of channels is total objects - file objects - group objects
-        self.fileinfo['n_channels'] = struct.unpack('i',
-                                                    self._tdms_file.read(4))[0] - 2
-        # Read length of object path:
-        var = struct.unpack('<i', self._tdms_file.read(4))[0]
-        # skip over object path and raw data index:
-        self._tdms_file.seek(var + 4, 1)
+        self.fileinfo['n_channels'] = struct.unpack_from('<i', meta, 0)[0] - 2
+        # Read length of object path, skip over object path and raw data index:
+        var = struct.unpack_from('<i', meta, 4)[0]
+        pos = 8 + var + 4
         # Read number of properties in this group:
-        var = struct.unpack('<i', self._tdms_file.read(4))[0]
+        var = struct.unpack_from('<i', meta, pos)[0]
+        pos += 4
 
-        # loop through and read each property
-        properties = [self._read_property() for _ in range(var)]
-        df = pd.DataFrame(properties)
-        df.columns = ['Property', 'Type', 'Value']
-        df.set_index('Property', inplace=True)
+        # loop through and unpack each property, keeping their order (and any repeated names) for mapping
+        self._property_list = []
+        for _ in range(var):
+            name, data_type, value, pos = unpack_property(meta, pos)
+            self._property_list.append((name, data_type, value))
 
-        self._end_of_properties_offset = self._tdms_file.tell()
+        self._end_of_properties_offset = LEAD_IN_LENGTH + pos
 
         self._read_chunk_size()
         #TODO: Add number of channels to properties
-        return df
+        return dict((name, value) for name, _, value in self._property_list)
 
     def _read_chunk_size(self):
         """ Read the data chunk size from the TDMS file header."""
         if self._end_of_properties_offset is None:
-            self._read_properties()
+            self._properties = self._read_properties()
+            return
 
-        self._tdms_file.seek(self._end_of_properties_offset, 0)
+        meta = self._read_metadata()
+        pos = self._end_of_properties_offset - LEAD_IN_LENGTH
 
         # skip over Group Information:
-        var = struct.unpack('<i', self._tdms_file.read(4))[0]
-        self._tdms_file.seek(var + 8, 1)
+        var = struct.unpack_from('<i', meta, pos)[0]
+        pos += 4 + var + 8
 
         # skip over first channel path and length of index information:
-        var = struct.unpack('<i', self._tdms_file.read(4))[0]
-        self._tdms_file.seek(var + 4, 1)
+        var = struct.unpack_from('<i', meta, pos)[0]
+        pos += 4 + var + 4
 
-        self._data_type = TDS_DATA_TYPE.get(
-            struct.unpack('<i', self._tdms_file.read(4))[0])
+        # Read data type, Dimension of the raw data array (has to be 1) and chunk size
+        data_type, dummy, self._chunk_size = struct.unpack_from('<iii', meta, pos)
+        self._data_type = TDS_DATA_TYPE.get(data_type)
         if self._data_type not in ('int16', 'float32'):
-            raise Exception('Unsupported TDMS data type: ' + self._data_type)
-
-        # Read Dimension of the raw data array (has to be 1):
-        dummy = struct.unpack('<i', self._tdms_file.read(4))[0]
-
-        self._chunk_size = struct.unpack('<i', self._tdms_file.read(4))[0]
+            raise Exception('Unsupported TDMS data type: ' + str(self._data_type))
 
-    def get_data(self, first_ch=0, last_ch=None, first_s=0, last_s=None):
+    def get_data(self, first_ch=0, last_ch=None, first_s=0, last_s=None, copy=True, ch_step=1, s_step=1, channels=None):
         """
         Get a block of data from the TDMS file.
         first_ch -- The first channel to load
         last_ch  -- The last channel to load
         first_s  -- The first sample to load
         last_s   -- The last sample to load
+        copy     -- If False, return a read only view of the memory map (no copy) when the samples
+                    are all in one chunk or interleaved segment, else copy them into a new array
+        ch_step  -- Load every ch_step-th channel from first_ch
+        s_step   -- Load every s_step-th sample from first_s
+        channels -- List of channel indexes to load instead of first_ch to last_ch (always copied)
+        The samples can span any number of segments and chunks. The steps are applied to the
+        memory map, so only the pages holding the loaded samples are read. last_read_copied is
+        set to whether the data was copied.
         """
-        if self._raw_data is None:
+        if self._pieces is None:
             self._initialise_data()
         if first_ch is None or first_ch < 0:
             first_ch = 0
@@ -288,150 +319,177 @@ class TdmsReader(object):
         else:
             # return data inclusive of last_ch, numpy indexing is exclusive of end index
             last_ch += 1
-        if last_s is None or last_s > self._channel_length:
+        if first_s is None or first_s < 0:
+            first_s = 0
+        if last_s is None or last_s >= self._channel_length:
             last_s = self._channel_length
         else:
             # return data inclusive of last_s, numpy indexing is exclusive of end index
             last_s += 1
-        nch = np.int(max(last_ch - first_ch, 0))
-        ns = np.int(max(last_s - first_s, 0))
+        if ch_step < 1 or s_step < 1:
+            raise ValueError('ch_step and s_step must be at least 1')
+        if channels is None:
+            ch_index = slice(first_ch, last_ch, ch_step)
+            nch = len(range(first_ch, last_ch, ch_step))
+        else:
+            ch_index = np.asarray(channels, dtype=np.intp)
+            nch = len(ch_index)
+        ns = len(range(first_s, last_s, s_step))
+
+        # Piece of contiguous samples holding first_s
+        starts = self._pieces[:, 0]
+        i = np.searchsorted(starts, first_s, side='right') - 1
+        if (not copy and channels is None and ns > 0 and nch > 0 and
+                last_s <= self._pieces[i, 0] + self._pieces[i, 2]):
+            self.last_read_copied = False
+            start = self._pieces[i, 0]
+            return self._piece(i)[first_s - start:last_s - start:s_step, ch_index]
 
         # Allocate output container
+        self.last_read_copied = True
         data = np.empty((ns, nch), dtype=np.dtype(self._data_type))
-        if data.size is 0:
-            return data
-        
-        ## 1. Index first block & reshape?
-        first_blk = first_s // self._chunk_size
-        last_blk = last_s // self._chunk_size
-        last_full_blk = min(last_blk + 1, self._raw_data.shape[1])
-        nchunk = min(max(last_full_blk - first_blk, 0), self._raw_data.shape[1])
-        first_s_1a = max(first_s - first_blk * self._chunk_size, 0)
-        last_s_1a = min(last_s - first_blk * self._chunk_size, nchunk*self._chunk_size)
-        ind_s = 0
-        ind_e = ind_s + max(last_s_1a - first_s_1a, 0)
-
-        # data_1a = self._raw_data[:, first_blk:last_full_blk,
-        #             first_ch:last_ch].reshape((self._chunk_size*nchunk, nch), order='F')[first_s_1a:last_s_1a, :]
-        d = self._raw_data[:, first_blk:last_full_blk,
-                    first_ch:last_ch]
-        d.shape = (self._chunk_size*nchunk, nch)
-        d.reshape((self._chunk_size*nchunk, nch), order='F')
-        data[ind_s:ind_e,:] = d[first_s_1a:last_s_1a, :]
-
-        ## 2. Index first additional samples
-        first_s_1b = max(first_s - self._raw_data.shape[1]*self._chunk_size, 0)
-        last_s_1b = min(last_s - self._raw_data.shape[1]*self._chunk_size, self._raw_last_chunk.shape[0])
-        ind_s = ind_e
-        ind_e = ind_s + max(last_s_1b - first_s_1b, 0)
-        # data_1b = self._raw_last_chunk[first_s_1b:last_s_1b,first_ch:last_ch]
-        if ind_e > ind_s:
-            data[ind_s:ind_e,:] = self._raw_last_chunk[first_s_1b:last_s_1b,first_ch:last_ch]
-
-        ## 3. Index second block
-        first_s_2 = max(first_s - self._seg1_length, 0)
-        last_s_2 = last_s - self._seg1_length
-        if (first_s_2 > 0 or last_s_2 > 0) and self._raw_data2 is not None:
-            first_blk_2 = max(first_s_2 // self._chunk_size, 0)
-            last_blk_2 = max(last_s_2 // self._chunk_size, 0)
-            last_full_blk_2 = min(last_blk_2 + 1, self._raw_data2.shape[1])
-            nchunk_2 = min(max(last_full_blk_2 - first_blk_2, 0), self._raw_data2.shape[1])
-            first_s_2a = max(first_s_2 - first_blk_2 * self._chunk_size, 0)
-            last_s_2a = min(last_s_2 - first_blk_2 * self._chunk_size, nchunk_2*self._chunk_size)
-            ind_s = ind_e
-            ind_e = ind_s + max(last_s_2a - first_s_2a, 0)
-            # data_2a = self._raw_data2[:, first_blk_2:last_full_blk_2,
-            #             first_ch:last_ch].reshape((self._chunk_size*nchunk_2, nch), order='F')[first_s_2a:last_s_2a, :]
-            if ind_e > ind_s:
-                data[ind_s:ind_e,:] = self._raw_data2[:, first_blk_2:last_full_blk_2,
-                        first_ch:last_ch].reshape((self._chunk_size*nchunk_2, nch), order='F')[first_s_2a:last_s_2a, :]
-        ## 4. Index second additional samples
-        if (first_s_2 > 0 or last_s_2 > 0) and self._raw2_last_chunk is not None:
-            first_s_2b = max(first_s_2 - self._raw_data2.shape[1]*self._chunk_size, 0)
-            last_s_2b = min(last_s_2 - self._raw_data2.shape[1]*self._chunk_size, self._raw2_last_chunk.shape[0])
-            ind_s = ind_e
-            ind_e = ind_s + max(last_s_2b - first_s_2b, 0)
-            # data_2b = self._raw2_last_chunk[first_s_2b:last_s_2b,first_ch:last_ch]
-            if ind_e > ind_s:
-                data[ind_s:ind_e,:] = self._raw2_last_chunk[first_s_2b:last_s_2b,first_ch:last_ch]
-        ## 5. Concatenate blocks
-        # data = np.concatenate((data_1a, data_1b, data_2a, data_2b))
         if data.size == 0:
-            data = data.reshape(0,0)
+            return data
+
+        # Copy from each piece the range overlaps, skipping pieces with no samples to load
+        ind = 0
+        while ind < ns:
+            sample = first_s + ind * s_step
+            i = np.searchsorted(starts, sample, side='right') - 1
+            start, n = self._pieces[i, 0], self._pieces[i, 2]
+            s_beg = sample - start
+            s_end = min(n, last_s - start)
+            k = len(range(s_beg, s_end, s_step))
+            data[ind:ind + k, :] = self._piece(i)[s_beg:s_end:s_step, ch_index]
+            ind += k
         return data
 
+    def iter_blocks(self, block_samples, channels=None, overlap=0, first_ch=0, last_ch=None, first_s=0, last_s=None, copy=True):
+        """
+        Generator of consecutive blocks of data from the TDMS file, for streaming it in constant memory.
+        block_samples -- Number of samples in each block, the last block holds any remainder
+        channels      -- List of channel indexes to load instead of first_ch to last_ch
+        overlap       -- Number of samples from before each block (except the first) to add to its start
+        first_ch      -- The first channel to load
+        last_ch       -- The last channel to load
+        first_s       -- The first sample to load
+        last_s        -- The last sample to load
+        copy          -- Passed to get_data, False for views of blocks inside one chunk
+        Block k starts at first_s + k * block_samples (minus the overlap), so blocks stay aligned to
+        time windows of block_samples. Segment and chunk boundaries are handled by get_data.
+        """
+        if block_samples < 1 or overlap < 0:
+            raise ValueError('block_samples must be at least 1 and overlap at least 0')
+        if first_s is None or first_s < 0:
+            first_s = 0
+        if last_s is None or last_s >= self.channel_length:
+            last_s = self.channel_length - 1
+        for beg in range(first_s, last_s + 1, block_samples):
+            end = min(beg + block_samples, last_s + 1)
+            yield self.get_data(first_ch, last_ch, max(beg - overlap, first_s), end - 1, copy=copy, channels=channels)
+
+    def _piece(self, i):
+        """Return a [samples, nch] view of the mapped data of piece i."""
+        start, offset, n, sample_major = self._pieces[i]
+        nch = self.fileinfo['n_channels']
+        if sample_major:
+            return np.ndarray((n, nch), dtype=self._data_type, buffer=self._dmap, offset=offset)
+        # Rotate the axes of [nch, samples] to [samples, nch]
+        return np.ndarray((nch, n), dtype=self._data_type, buffer=self._dmap, offset=offset).T
+
+    def _scan_segments(self):
+        """
+        Walk the lead in of every segment in the file.
+        Return a list of [raw data offset, number of samples, decimated] for each segment.
+        """
+        nch = self.fileinfo['n_channels']
+        itemsize = np.dtype(self._data_type).itemsize
+        segments = []
+        pos = 0
+        while pos + LEAD_IN_LENGTH <= self.file_size:
+            self._tdms_file.seek(pos, 0)
+            tag, toc, version, nso, rdo = struct.unpack('<4siiQQ', self._tdms_file.read(LEAD_IN_LENGTH))
+            if tag != b'TDSm':
+                break
+            data_offset = pos + LEAD_IN_LENGTH + rdo
+            # The last segment may not be complete (next segment offset of 0xFFFFFFFFFFFFFFFF)
+            seg_end = min(pos + LEAD_IN_LENGTH + nso, self.file_size)
+            n_samples = max(seg_end - data_offset, 0) // (nch * itemsize)
+            segments.append([data_offset, n_samples, not bool(toc & DECIMATE_MASK)])
+            pos = seg_end
+        return segments
+
+    def _index_filename(self):
+        return self._tdms_file.name + '.index.json'
+
+    def _load_index(self):
+        """Return the segments from the index file, or None if it is missing or out of date."""
+        try:
+            with open(self._index_filename(), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(self._tdms_file.name)
+        if (index.get('version') != INDEX_VERSION or index.get('file_size') != stat.st_size or
+                index.get('mtime_ns') != stat.st_mtime_ns or index.get('chunk_size') != self._chunk_size):
+            return None
+        return index['segments']
+
+    def _save_index(self):
+        """Write the segments to the index file next to the TDMS file, if it can be written."""
+        stat = os.stat(self._tdms_file.name)
+        index = {'version': INDEX_VERSION,
+                 'file_size': stat.st_size,
+                 'mtime_ns': stat.st_mtime_ns,
+                 'n_channels': self.fileinfo['n_channels'],
+                 'data_type': self._data_type,
+                 'chunk_size': self._chunk_size,
+                 'segments': self._segments}
+        tmp_name = self._index_filename() + '.tmp'
+        try:
+            with open(tmp_name, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_name, self._index_filename())
+        except OSError:
+            pass
+
     def _initialise_data(self):
-        """Initialise the memory map for the data array."""
+        """Build the segment table (from the index file if it is up to date) and memory map the data."""
         if self._chunk_size is None:
             self._read_chunk_size()
 
-        dmap = mmap.mmap(self._tdms_file.fileno(), 0, access=mmap.ACCESS_READ)
-        rdo = np.int(self.fileinfo['raw_data_offset'])
-        nch = np.int(self.fileinfo['n_channels'])
-
-        #TODO: Support streaming file type?
-        #TODO: Is this a valid calculation for ChannelLength?
-        nso = self.fileinfo['next_segment_offset']
-        self._seg1_length = np.int((nso - rdo) / nch / np.dtype(self._data_type).itemsize)
-        self._channel_length = self._seg1_length
-
-        if self.fileinfo['decimated']:
-            n_complete_blk = np.int(self._seg1_length / self._chunk_size)
-            ax_ord = 'C'
-        else:
-            n_complete_blk = 0
-            ax_ord = 'F'
-        self._raw_data = np.ndarray((n_complete_blk, nch, self._chunk_size),
-                                    dtype=self._data_type,
-                                    buffer=dmap,
-                                    offset=rdo)
-        # Rotate the axes to [chunk_size, nblk, nch]
-        self._raw_data = np.rollaxis(self._raw_data, 2)
-        additional_samples = np.int(self._seg1_length - n_complete_blk * self._chunk_size)
-        additional_samples_offset = rdo + n_complete_blk*nch*self._chunk_size*np.dtype(self._data_type).itemsize
-        self._raw_last_chunk = np.ndarray((nch, additional_samples),
-                                    dtype=self._data_type,
-                                    buffer=dmap,
-                                    offset=additional_samples_offset,
-                                    order=ax_ord)
-        # Rotate the axes to [samples, nch]
-        self._raw_last_chunk = np.rollaxis(self._raw_last_chunk, 1)
-
-        if self.file_size == nso:
-            self._seg2_length = 0
-        else:
-            self._tdms_file.seek(nso + 12, 0)
-            (seg2_nso, seg2_rdo) = struct.unpack('<qq',
-                                                 self._tdms_file.read(2 * 8))
-            self._seg2_length = (seg2_nso - seg2_rdo) / nch / np.dtype(self._data_type).itemsize
-            if self.fileinfo['decimated']:
-                n_complete_blk2 = np.int(self._seg2_length / self._chunk_size)
-            else:
-                n_complete_blk2 = np.int(0)
-            self._raw_data2 = np.ndarray((n_complete_blk2, nch, self._chunk_size),
-                                         dtype=self._data_type,
-                                         buffer=dmap,
-                                         offset=(nso + LEAD_IN_LENGTH + seg2_rdo))
-            self._raw_data2 = np.rollaxis(self._raw_data2, 2)
-            additional_samples = np.int(self._seg2_length - n_complete_blk2 * self._chunk_size)
-            additional_samples_offset = nso + LEAD_IN_LENGTH + seg2_rdo + n_complete_blk2*nch*self._chunk_size*np.dtype(self._data_type).itemsize
-            self._raw2_last_chunk = np.ndarray((nch, additional_samples),
-                                    dtype=self._data_type,
-                                    buffer=dmap,
-                                    offset=additional_samples_offset,
-                                    order=ax_ord)
-            # Rotate the axes to [samples, nch]
-            self._raw2_last_chunk = np.rollaxis(self._raw2_last_chunk, 1)
-
-            if self._raw_data2.size != 0 or self._raw2_last_chunk.size != 0:
-                pass
-                # raise Exception('Second segment contains some data, \
-                #                 not currently supported')
-            self._channel_length = self._seg1_length + self._seg2_length
-        # else:
-        #     print "Not decimated"
-        #     raise Exception('Reading file with decimated flag not set is not \
-        #                     supported yet')
+        if self._segments is None:
+            if self.use_index:
+                self._segments = self._load_index()
+            if self._segments is None:
+                self._segments = self._scan_segments()
+                if self.use_index:
+                    self._save_index()
+
+        self._dmap = mmap.mmap(self._tdms_file.fileno(), 0, access=mmap.ACCESS_READ)
+        nch = self.fileinfo['n_channels']
+        itemsize = np.dtype(self._data_type).itemsize
+
+        # Split the segments into pieces of contiguous samples: [first sample, offset, samples, sample major]
+        # Decimated segments hold whole chunks of chunk_size samples of each channel in turn, then
+        # the additional samples of each channel. Interleaved segments are one piece of samples of all channels.
+        pieces = []
+        start = 0
+        for offset, n_samples, decimated in self._segments:
+            if decimated:
+                n_complete_blk = n_samples // self._chunk_size
+                for blk in range(n_complete_blk):
+                    pieces.append((start, offset + blk * nch * self._chunk_size * itemsize, self._chunk_size, 0))
+                    start += self._chunk_size
+                additional_samples = n_samples - n_complete_blk * self._chunk_size
+                if additional_samples > 0:
+                    pieces.append((start, offset + n_complete_blk * nch * self._chunk_size * itemsize, additional_samples, 0))
+                    start += additional_samples
+            elif n_samples > 0:
+                pieces.append((start, offset, n_samples, 1))
+                start += n_samples
+        self._pieces = np.array(pieces, dtype=np.int64).reshape(-1, 4)
+        self._channel_length = start
 
 
 if __name__ == '__main__':
@@ -92,6 +92,11 @@ def save_file(filename):
     min_data = module.min_data
     file_path = module.file_path
     integerDownsampleFactor = module.downsamp_factor
+    #precision of the data products, older param files without it use float64
+    dtype = np.dtype(getattr(module, 'dtype', 'float64'))
+    num_peaks = getattr(module, 'num_peaks', 1)
+    freq_bands = getattr(module, 'freq_bands', None)
+    space_downsamp_factor = getattr(module, 'space_downsamp_factor', 10)
     
     #set up connection to server
     client = setup_server()
@@ -137,30 +142,34 @@ def save_file(filename):
     #dT value from md, used to calculate nyquist
     nyq_freq = condenser.calc_nyq_freq(dt)
     
-    #get condensed matrix and frequency domain stats
-    spect, std_devs, means, max_vals, peak_freq = condenser.condmatrix(output, num_time_windows, time_window, num_sensor_groups, ch_group_size, n_channels - 1, num_freq, nyq_freq)
+    #frequencies of the stored freq bins, only the bins inside freq_bands if given
+    if freq_bands is None:
+        num_freq_bins = num_freq
+        width_freq_bin = nyq_freq / num_freq
+    else:
+        freq_bins = condenser.band_bins(freq_bands, time_window, nyq_freq)
+        num_freq_bins = len(freq_bins)
+        width_freq_bin = 2 * nyq_freq / time_window
     
-    #avg together every 10 time windows to get smaller number of values to store, pad if number of tws are not evenly divided by 10
-    spect = np.pad(spect.astype(float), ((0, 0 if spect.shape[0] % 10 == 0 else 10 - spect.shape[0] % 10), (0,0), (0,0)), mode='constant', constant_values=np.NaN)
-    spect = spect.reshape(-1, 10, num_sensor_groups, num_freq)
-    spect = np.nanmean(spect, axis=1)
+    #get condensed matrix and frequency domain stats
+    #avg together every 10 time windows to get smaller number of values to store, the last row averages any remainder windows
+    #also get the peak frequency bins of every time window and channel group
+    spect, std_devs, means, max_vals, peak_freq, peak_inds, peak_amps = condenser.condmatrix(output, num_time_windows, time_window, num_sensor_groups, ch_group_size, n_channels - 1, num_freq, nyq_freq, dtype=dtype, time_bin=10, return_peaks=True, top_k=num_peaks, freq_bands=freq_bands)
     
-    #get time domain stats
-    means_t = condenser.mean_time(output)
-    stds_t = condenser.std_dev_time(output)
-    maxs_t = condenser.max_time(output)
+    #get time domain stats in one pass over the data
+    means_t, stds_t, maxs_t = condenser.time_stats(output)
     
     sampling_duration = num_time_samples * dt
     
-    #shift data down by subtracting mean of each channel from each time sample for that channel so cos taper works
-    shift_data = output - means_t
-    
-    #lowpass and downsample
-    (time_ser,data,downsampled_time, downsampled_signal,sampling_freq,downsampled_sampling_freq) = lowpassDownsample.runLowpassAndDownsample(shift_data, sampling_duration, num_time_samples, samp_rate, integerDownsampleFactor)
-    
-    #resample over space
-    new_num_samp = math.ceil(downsampled_signal.shape[0] / 10)
-    res = scipy.signal.resample(downsampled_signal, new_num_samp, axis=0)
+    #lowpass and downsample along the time axis of the fetched data, subtracting the mean of each channel block by block,
+    #then lowpass and downsample the result over channels
+    #the time downsampled signal is stored as channels by time samples, so it is written through its transpose
+    #one stage of the whole factor keeps the same filter as scipy.signal.decimate and earlier saved files
+    num_ds_samples = lowpassDownsample.downsampledLength(num_time_samples, integerDownsampleFactor, maxStageFactor=integerDownsampleFactor)
+    downsampled_signal = np.empty((n_channels, num_ds_samples), dtype=dtype)
+    _, space_time_signal = lowpassDownsample.spaceTimeDownsample(output, integerDownsampleFactor, space_downsamp_factor, samp_rate, timeOut=downsampled_signal.T, means=means_t, maxStageFactor=integerDownsampleFactor)
+    downsampled_sampling_freq = samp_rate / integerDownsampleFactor
+    downsampled_time = np.linspace(0, sampling_duration, num_ds_samples, endpoint=False)
     
     #save as hdf5 file
     
@@ -171,6 +180,15 @@ def save_file(filename):
     #save spectral tensor as a dataset
     hf.create_dataset('spectral_tensor', data=spect)
     
+    #save peak frequency bin indexes (multiply by width_freq_bin for Hz) and their mean magnitudes, shape (time windows, channel groups, num_peaks)
+    hf.create_dataset('peak_frequency_index', data=peak_inds)
+    hf.create_dataset('peak_frequency_amplitude', data=peak_amps)
+    
+    #save frequency in Hz of each freq bin of the spectral tensor when only freq_bands were calculated
+    if freq_bands is not None:
+        hf.create_dataset('frequencies', data=freq_bins * width_freq_bin)
+        hf.attrs['freq_bands'] = np.array(freq_bands, dtype=float)    #(low, high) Hz of each band
+    
     #save frequency domain stats in a group
     freq_g = hf.create_group('frequency_domain_stats')
     freq_g.create_dataset('std_deviations',data=std_devs)
@@ -180,9 +198,10 @@ def save_file(filename):
     
     #save time domain stats in a group
     time_g = hf.create_group('time_domain_stats')
-    time_g.create_dataset('std_deviations',data=stds_t)
-    time_g.create_dataset('means',data=means_t)
-    time_g.create_dataset('maximums',data=maxs_t)
+    #time stats are accumulated in float64 and saved in the precision of the data products
+    time_g.create_dataset('std_deviations',data=stds_t.astype(dtype))
+    time_g.create_dataset('means',data=means_t.astype(dtype))
+    time_g.create_dataset('maximums',data=maxs_t.astype(dtype))
     
     #save lowpass and downsample data
     lpds = hf.create_group('lowpass_downsample_signals')
@@ -190,6 +209,11 @@ def save_file(filename):
     lpds.create_dataset('lowpass_and_downsample', data=downsampled_signal)
     lpds.create_dataset('downsampled_sampling_freq', data=downsampled_sampling_freq)
     
+    #save data downsampled over time and channels, time samples by channels
+    st_ds = lpds.create_dataset('space_time_downsample', data=space_time_signal.astype(dtype, copy=False))
+    st_ds.attrs['dt'] = dt * integerDownsampleFactor                #time between samples in seconds
+    st_ds.attrs['dx'] = dx * space_downsamp_factor                  #distance between channels in m
+    
     
     #save metadata
     hf.attrs['first_sample_time'] = beg_time                    #time of fetching data
@@ -199,10 +223,11 @@ def save_file(filename):
     hf.attrs['num_ch_groups'] = num_sensor_groups               #number of channel groups
     hf.attrs['ch_group_size'] = ch_group_size                   #number of channels per group (except remainder channels group which is size : n_channels - ((num_sensor_groups - 1)*ch_group_size))
     hf.attrs['num_channels'] = n_channels                       #number of channels
-    hf.attrs['num_freq_bins'] = num_freq                        #number of frequency bins
-    hf.attrs['width_freq_bin'] = nyq_freq / num_freq            #width of each freq bin in Hz
+    hf.attrs['num_freq_bins'] = num_freq_bins                   #number of frequency bins
+    hf.attrs['width_freq_bin'] = width_freq_bin                 #width of each freq bin in Hz
     hf.attrs['nyquist_freq'] = nyq_freq                         #nyquist frequency 
     hf.attrs['dt'] = dt                                         #dt value
     hf.attrs['dx'] = dx                                         #dx value
+    hf.attrs['dtype'] = dtype.name                              #precision of the data products
     
     hf.close()
@@ -18,7 +18,19 @@ calc_num_freq - Calculate number of frequency bins
 mean_time - Calculate the mean of each channel in time domain
 std_dev_time - Calculate the std deviation of each channel in time domain
 max_time - Calculate the max value of each channel in time domain
+time_stats - Calculate the mean, std deviation and max value of each channel in one pass
+group_bounds - Calculate the start and end channels of each channel group
+reduce_bins - Reduce groups of adjacent values along an axis (mean, max or sum)
+band_bins - Find the frequency bins of a time window inside given frequency bands
 condmatrix - Create spectral tensor and calculate descriptive statistics
+condmatrix_out_of_core - Create spectral tensor from data larger than memory, one time window at a time
+
+Classes
+-------
+
+StreamingCondenser - Create spectral tensor rows as blocks of data arrive
+CondenserPlan - Condense data with fixed geometry repeatedly into reused output arrays
+TimeStats - Accumulate time domain statistics of each channel over blocks of data
 
 Author(s)
 ---------
@@ -28,6 +40,7 @@ Samantha Paulus
 import numpy as np
 from scipy import fft
 import math
+from concurrent.futures import ThreadPoolExecutor
 
 
 def rfft(some_data):
@@ -218,17 +231,451 @@ def max_time(some_data):
     return np.amax(some_data, axis=0)
 
 
-def condmatrix(some_data, num_time_windows, time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq):
+def time_stats(some_data, block_size=1024):
+    """
+    Calculate the mean, standard deviation and maximum value of each channel in the time domain (original data)
+    in one pass over the data
+    
+    Same results as mean_time, std_dev_time and max_time, but the data is read once in blocks of rows
+    that fit in cache instead of three times. See TimeStats.
+    
+    Parameters
+    ----------
+    some_data : array
+        2D array of original data, with rows as time samples and columns as channels
+    block_size : int
+        Number of time samples per block
+    
+    Returns
+    -------
+    tuple
+        1D arrays of length number of channels, containing the means, standard deviations and maximum values of each channel
+    """
+    
+    stats = TimeStats(some_data.shape[1], block_size=block_size)
+    stats.update(some_data)
+    return stats.mean, stats.std, stats.max
+
+
+def group_bounds(num_sensor_groups, ch_group_size, last_channel):
+    """
+    Calculate the start and end channel indexes of each channel group
+    
+    Every group holds ch_group_size channels except the last one, which ends at last_channel
+    and so holds any remainder channels.
+    
+    Parameters
+    ----------
+    num_sensor_groups : int
+        Number of channel groups for data
+    ch_group_size : int
+        Number of channels per channel group
+    last_channel : int
+        Index of last channel in data
+    
+    Returns
+    -------
+    array
+        2D int array of shape (num_sensor_groups, 2) holding the start (inclusive) and end (exclusive) channel of each group
+    """
+    
+    bounds = np.zeros((num_sensor_groups, 2), dtype=int)
+    bounds[:, 0] = np.arange(num_sensor_groups) * ch_group_size
+    bounds[:, 1] = bounds[:, 0] + ch_group_size
+    #last group always ends after the last channel, same as the remainder handling in condmatrix
+    if num_sensor_groups > 0:
+        bounds[-1, 1] = last_channel + 1
+    
+    return bounds
+
+
+_BIN_REDUCERS = {'mean': np.add, 'sum': np.add, 'max': np.maximum, 'min': np.minimum}
+
+
+def reduce_bins(arr, bin_size, reduce='mean', axis=-1):
+    """
+    Reduce every bin_size adjacent values along an axis to one value
+    
+    If the length of the axis is not evenly divisible by bin_size, the last bin holds the remainder
+    values and is reduced over only those (a mean is divided by the number of values in the bin). 
+    Uses ufunc.reduceat, so no padded copy of the array is made.
+    
+    Parameters
+    ----------
+    arr : array
+        Array to reduce
+    bin_size : int
+        Number of adjacent values per bin
+    reduce : string
+        'mean', 'max', 'min' or 'sum'
+    axis : int
+        Axis to reduce along
+    
+    Returns
+    -------
+    array
+        Array with ceil(length / bin_size) values along axis
+    """
+    
+    if reduce not in _BIN_REDUCERS:
+        raise ValueError("Unknown reducer: " + str(reduce))
+    if bin_size == 1 or arr.shape[axis] == 0:
+        return arr
+    
+    n = arr.shape[axis]
+    starts = np.arange(0, n, bin_size)
+    reduced = _BIN_REDUCERS[reduce].reduceat(arr, starts, axis=axis)
+    if reduce == 'mean':
+        counts_shape = [1] * arr.ndim
+        counts_shape[axis] = -1
+        counts = np.minimum(bin_size, n - starts).reshape(counts_shape)
+        reduced = reduced / counts.astype(reduced.dtype)
+    
+    return reduced
+
+
+def band_bins(freq_bands, time_window, nyq_freq):
+    """
+    Find the indexes of the frequency bins of one time window that are inside any of the given frequency bands
+    
+    Parameters
+    ----------
+    freq_bands : list
+        (low, high) frequency pairs in Hz, inclusive of both ends
+    time_window : int
+        Number of time samples per time window
+    nyq_freq : int
+        Nyquist frequency of original data aka half of sampling frequency
+    
+    Returns
+    -------
+    array
+        Sorted int array of rFFT bin indexes, the frequency of bin k is k * 2 * nyq_freq / time_window Hz
+    
+    Raises
+    ------
+    ValueError
+        If no frequency bin is inside any of the bands
+    """
+    
+    freqs = fftfreq(2 * nyq_freq, time_window)
+    in_band = np.zeros(freqs.shape[0], dtype=bool)
+    for low, high in freq_bands:
+        in_band |= (freqs >= low) & (freqs <= high)
+    
+    bins = np.flatnonzero(in_band)
+    if bins.shape[0] == 0:
+        raise ValueError("freq_bands " + str(list(freq_bands)) + " hold no frequency bins between 0 and " + str(nyq_freq) + " Hz")
+    return bins
+
+
+def _band_magnitudes(windows, bins, dtype=np.float64):
+    """
+    Calculate the Fourier transform magnitudes of only the selected frequency bins of every time window
+    
+    When there are only a few bins, they are calculated as a direct DFT, two real matrix products of the 
+    cosine and sine terms with the windows, which costs len(bins) operations per sample against the 
+    log2(window size) of a full rFFT. Otherwise the full rFFT is taken and the bins picked out of it.
+    
+    Parameters
+    ----------
+    windows : array
+        3D array of original data of shape (number of time windows, time window size, number of channels)
+    bins : array
+        Int array of rFFT bin indexes
+    dtype : data-type
+        Real floating point type of the calculation
+    
+    Returns
+    -------
+    array
+        3D array of magnitudes of shape (windows, len(bins), channels)
+    """
+    
+    n = windows.shape[1]
+    if len(bins) > 2 * math.log2(max(n, 2)):
+        return np.abs(fft.rfft(windows, axis=1)[:, bins])
+    
+    #exp(-2 pi i k t / n) with k t taken mod n first to keep the angles accurate
+    angles = (2 * np.pi / n) * (np.outer(bins, np.arange(n)) % n)
+    real = np.matmul(np.cos(angles).astype(dtype), windows)
+    imag = np.matmul(np.sin(angles).astype(dtype), windows)
+    
+    return np.hypot(real, imag)
+
+
+def _condense_windows(windows, bounds, dtype=np.float64, bins=None, out=None):
+    """
+    Calculate the condensed spectra and statistics for a block of whole time windows
+    
+    All the windows are transformed with one rFFT over the time axis, and the outlier removal,
+    averaging and statistics are done as array reductions over every channel group at once.
+    Runs of channel groups with the same size are reshaped together, so the only groups handled
+    on their own are ones with a different size (the remainder group).
+    
+    Parameters
+    ----------
+    windows : array
+        3D array of original data of shape (number of time windows, time window size, number of channels)
+    bounds : array
+        Start and end channel of each group relative to the first channel of windows, from group_bounds
+    dtype : data-type
+        Real floating point type the windows are transformed and the results are calculated in
+    bins : array
+        Int array of the rFFT bins to calculate, every bin if None
+    out : tuple
+        Arrays of dtype to write the five results to, allocated if None
+    
+    Returns
+    -------
+    tuple
+        spectra (windows, groups, freqs), std deviations (windows, groups), sums of the magnitudes 
+        over the channels of each group (windows, groups, freqs), sums of the magnitudes for each
+        channel (channels), max magnitude for each channel (channels)
+    """
+    
+    n_win = windows.shape[0]
+    n_groups = bounds.shape[0]
+    
+    #one transform for every window and channel, magnitudes of shape (windows, freqs, channels)
+    #float32 windows are transformed to complex64 by scipy, so the magnitudes keep the precision of dtype
+    if bins is None:
+        mags = np.abs(fft.rfft(windows.astype(dtype, copy=False), axis=1))
+    else:
+        mags = _band_magnitudes(windows.astype(dtype, copy=False), bins, dtype)
+    n_freq = mags.shape[1]
+    
+    if out is None:
+        spect = np.empty((n_win, n_groups, n_freq), dtype=dtype)
+        std_devs = np.empty((n_win, n_groups), dtype=dtype)
+        abs_sums = np.empty((n_win, n_groups, n_freq), dtype=dtype)
+        ch_sums = np.empty(mags.shape[2], dtype=dtype)
+        ch_maxs = np.empty(mags.shape[2], dtype=dtype)
+    else:
+        spect, std_devs, abs_sums, ch_sums, ch_maxs = out
+    
+    sizes = bounds[:, 1] - bounds[:, 0]
+    g = 0
+    while g < n_groups:
+        #find the run of consecutive groups with the same size
+        g_end = g + 1
+        while g_end < n_groups and sizes[g_end] == sizes[g]:
+            g_end += 1
+        size = sizes[g]
+        
+        #(windows, freqs, groups in run, channels per group)
+        grp = mags[:, :, bounds[g, 0]:bounds[g_end - 1, 1]].reshape(n_win, n_freq, g_end - g, size)
+        
+        #norms of the channel columns for the outlier check, same as np.linalg.norm over the freq axis
+        norms = np.sqrt(np.sum(grp * grp, axis=1))
+        
+        #use 1.5 * interquartile range as cutoff
+        q1, q3 = np.percentile(norms, [25, 75], axis=-1, keepdims=True)
+        cutoff = 1.5 * (q3 - q1)
+        keep = (norms <= (q3 + cutoff)) & (norms >= (q1 - cutoff))
+        
+        #avg together the non outlier channels of each group
+        kept_sums = np.einsum('wfgc,wgc->wgf', grp, keep.astype(grp.dtype))
+        spect[:, g:g_end, :] = kept_sums / np.sum(keep, axis=-1)[:, :, np.newaxis]
+        
+        std_devs[:, g:g_end] = np.std(grp, axis=(1, 3))
+        abs_sums[:, g:g_end, :] = np.moveaxis(np.sum(grp, axis=3), 1, 2)
+        g = g_end
+    
+    np.sum(mags, axis=(0, 1), out=ch_sums)
+    #max values start at 0, same as the loop method of condmatrix
+    np.max(mags, axis=(0, 1), initial=0, out=ch_maxs)
+    
+    return spect, std_devs, abs_sums, ch_sums, ch_maxs
+
+
+def _condense_tiles(windows, bounds, workers=None, dtype=np.float64, bins=None, out=None):
+    """
+    Calculate the condensed spectra and statistics of whole time windows split into tiles run on a thread pool
+    
+    The time windows are split into blocks of windows and, when there are fewer windows than workers,
+    the channel groups are split into blocks of whole groups as well. Each tile is condensed with 
+    _condense_windows and its results are written into (or for the channel stats, merged into) the
+    full size arrays, so the results are the same as condensing all the windows at once.
+    
+    Parameters
+    ----------
+    windows : array
+        3D array of original data of shape (number of time windows, time window size, number of channels)
+    bounds : array
+        Start and end channel of each group, from group_bounds
+    workers : int
+        Number of threads, None or 1 to condense all the windows at once on the calling thread
+    dtype : data-type
+        Real floating point type the windows are transformed and the results are calculated in
+    bins : array
+        Int array of the rFFT bins to calculate, every bin if None
+    out : tuple
+        Arrays of dtype to write the five results to, allocated if None
+    
+    Returns
+    -------
+    tuple
+        Same as _condense_windows
+    """
+    
+    n_win = windows.shape[0]
+    n_groups = bounds.shape[0]
+    if workers is None or workers <= 1 or n_win * n_groups <= 1:
+        return _condense_windows(windows, bounds, dtype, bins, out)
+    
+    #split windows first, then groups if there are not enough windows to keep every worker busy
+    n_tw_tiles = min(n_win, workers)
+    n_g_tiles = min(n_groups, math.ceil(workers / n_tw_tiles))
+    tw_edges = np.linspace(0, n_win, n_tw_tiles + 1).astype(int)
+    g_edges = np.linspace(0, n_groups, n_g_tiles + 1).astype(int)
+    
+    n_freq = windows.shape[1] // 2 + 1 if bins is None else len(bins)
+    n_channels = windows.shape[2]
+    if out is None:
+        spect = np.empty((n_win, n_groups, n_freq), dtype=dtype)
+        std_devs = np.empty((n_win, n_groups), dtype=dtype)
+        abs_sums = np.empty((n_win, n_groups, n_freq), dtype=dtype)
+        ch_sums = np.zeros(n_channels, dtype=dtype)
+        ch_maxs = np.zeros(n_channels, dtype=dtype)
+    else:
+        spect, std_devs, abs_sums, ch_sums, ch_maxs = out
+        ch_sums.fill(0)
+        ch_maxs.fill(0)
+    
+    def condense_tile(tw_beg, tw_end, g_beg, g_end):
+        c_beg = bounds[g_beg, 0]
+        c_end = bounds[g_end - 1, 1]
+        return _condense_windows(windows[tw_beg:tw_end, :, c_beg:c_end], bounds[g_beg:g_end] - c_beg, dtype, bins)
+    
+    tiles = [(tw_edges[i], tw_edges[i + 1], g_edges[j], g_edges[j + 1]) for i in range(n_tw_tiles) for j in range(n_g_tiles)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(condense_tile, *tile) for tile in tiles]
+        
+        #merge in tile order so the results do not depend on which thread finishes first
+        for (tw_beg, tw_end, g_beg, g_end), future in zip(tiles, futures):
+            t_spect, t_std_devs, t_abs_sums, t_ch_sums, t_ch_maxs = future.result()
+            c_beg = bounds[g_beg, 0]
+            c_end = bounds[g_end - 1, 1]
+            spect[tw_beg:tw_end, g_beg:g_end] = t_spect
+            std_devs[tw_beg:tw_end, g_beg:g_end] = t_std_devs
+            abs_sums[tw_beg:tw_end, g_beg:g_end] = t_abs_sums
+            ch_sums[c_beg:c_end] += t_ch_sums
+            np.maximum(ch_maxs[c_beg:c_end], t_ch_maxs, out=ch_maxs[c_beg:c_end])
+    
+    return spect, std_devs, abs_sums, ch_sums, ch_maxs
+
+
+def _bin_freqs(n_freq, nyq_freq, num_freq):
+    """
+    Frequency in Hz given to each frequency bin by condmatrix, bin index times nyq_freq / num_freq
+    """
+    
+    return np.arange(n_freq) * (nyq_freq / num_freq)
+
+
+def _peak_freq(abs_sums, freqs):
+    """
+    Find the peak frequency in Hz from the magnitude sums of every time window and channel group
+    
+    The first (time window, channel group, frequency) with the highest sum wins, the same as the 
+    strict comparison in the time window then channel group order used by condmatrix. 
+    
+    Parameters
+    ----------
+    abs_sums : array
+        3D array of summed magnitudes of shape (windows, groups, freqs)
+    freqs : array
+        Frequency in Hz of each frequency bin in abs_sums
+    
+    Returns
+    -------
+    tuple
+        float of peak frequency in Hz, float of its summed magnitude
+    """
+    
+    if abs_sums.size == 0:
+        return 0.0, 0.0
+    
+    flat_ind = np.argmax(abs_sums)
+    peak_freq_val = abs_sums.flat[flat_ind]
+    if not peak_freq_val > 0.0:
+        return 0.0, 0.0
+    max_ind = flat_ind % abs_sums.shape[-1]
+    
+    return freqs[max_ind], peak_freq_val
+
+
+def _window_peaks(abs_sums, bounds, top_k=1, bins=None):
+    """
+    Find the top_k peak frequency bins of every time window and channel group
+    
+    Peaks are taken from the magnitude sums the condenser already calculated for the global peak 
+    frequency, so no extra transforms are needed. Equal sums are ordered by frequency bin, so with 
+    top_k of 1 the peak is the same bin np.argmax picks.
+    
+    Parameters
+    ----------
+    abs_sums : array
+        3D array of magnitudes summed over the channels of each group, of shape (windows, groups, freqs)
+    bounds : array
+        Start and end channel of each group, from group_bounds
+    top_k : int
+        Number of peaks per time window and channel group
+    bins : array
+        Int array of the rFFT bins in abs_sums, every bin if None
+    
+    Returns
+    -------
+    tuple
+        3D int array of rFFT bin indexes of shape (windows, groups, top_k) from highest to lowest peak,
+        3D array of the mean magnitude over the channels of the group at those bins
+    """
+    
+    order = np.argsort(-abs_sums, axis=-1, kind='stable')[:, :, :top_k]
+    sizes = (bounds[:, 1] - bounds[:, 0]).astype(abs_sums.dtype)
+    amps = np.take_along_axis(abs_sums, order, axis=-1) / sizes[np.newaxis, :, np.newaxis]
+    if bins is not None:
+        order = bins[order]
+    
+    return order, amps
+
+
+def condmatrix(some_data, num_time_windows, time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq, method='vectorized', workers=None, dtype=np.float64, freq_bin=1, freq_reduce='mean', time_bin=1, time_reduce='mean', return_peaks=False, top_k=1, freq_bands=None):
     """
     Create and fill a 3D spectral tensor composed of condensed Fourier transformed data from an original 2D data array
     and calculate descriptive statistics (standard deviation, mean, maxiumums, peak frequency)
     
     3D tensor is created with shape (number of time windows, number of channel groups, number of frequency bins).
-    Function iterates through slices of time samples and channels (time windows and channel groups) 
-    from the original data and calculates, condenses and stores the discrete Fourier transform values 
+    The Fourier transform of each time window and channel group of the original data is condensed and stored 
     in the corresponding place in the spectral tensor.
     Outliers are determined using 1.5 times the interquartile range and removed. 
     
+    Two methods give the same results (within floating point tolerance). 'vectorized' reshapes the data into
+    (time windows, time window size, channels), takes one rFFT of the whole array and calculates everything 
+    as array reductions. 'loop' iterates through every time window and channel group combination. 
+    With workers the vectorized method splits the time windows and channel groups into tiles that run
+    on a thread pool (the rFFT and reductions release the GIL), then merges the tile results.
+    
+    The data is converted to dtype one tile at a time before its transform, and the transform, statistics
+    and returned arrays all use that precision. np.float32 transforms to complex64, which halves the 
+    memory traffic and speeds up the rFFT compared to the default np.float64 (see SourceCode/README.md
+    for how much the results differ).
+    
+    The spectral tensor can be condensed further by reducing every freq_bin adjacent frequency bins and
+    every time_bin adjacent time windows to one value (see reduce_bins). The vectorized method condenses 
+    time_bin windows at a time and reduces them straight away, so the full resolution tensor is never held.
+    
+    With return_peaks the top_k peak frequency bins of every time window and channel group, and their
+    mean magnitudes, are also returned. They come from the same magnitude sums used for the global
+    peak frequency and are not affected by freq_bin or time_bin. Multiply an index by nyq_freq / num_freq 
+    to get the frequency in Hz, the same as peak_freq.
+    
+    With freq_bands only the frequency bins inside the bands are calculated (see band_bins), as a direct
+    DFT of those bins when there are only a few of them. The spectral tensor then has one frequency per
+    selected bin, and the channel statistics, outlier checks and peaks only use those bins. Peak 
+    frequencies are the exact bin frequencies, bin index times 2 * nyq_freq / time_window.
+    
     Parameters
     ----------
     some_data : array
@@ -247,28 +694,126 @@ def condmatrix(some_data, num_time_windows, time_window, num_sensor_groups, ch_g
         Number of frequency bins calculated from time samples and window size 
     nyq_freq : int
         Nyquist frequency of original data aka half of sampling frequency
+    method : string
+        'vectorized' (default) or 'loop'
+    workers : int
+        Number of threads for the vectorized method, None or 1 to run on the calling thread
+    dtype : data-type
+        Real floating point type for the calculations and results, np.float64 (default) or np.float32
+    freq_bin : int
+        Number of adjacent frequency bins reduced to one in the spectral tensor
+    freq_reduce : string
+        Reducer for frequency bins, 'mean' (default), 'max' or 'sum'
+    time_bin : int
+        Number of adjacent time windows reduced to one in the spectral tensor (standard deviations keep every window)
+    time_reduce : string
+        Reducer for time windows, 'mean' (default), 'max' or 'sum'
+    return_peaks : bool
+        Also return the peak frequency bins of every time window and channel group
+    top_k : int
+        Number of peaks per time window and channel group
+    freq_bands : list
+        (low, high) frequency pairs in Hz to calculate, every frequency bin if None
     
     Returns
     -------
     tuple
         3D spectral tensor, 2D array of standard deviation values, 2D array of means for each window and channel group,
         1D array of max value for each channel, float of peak frequency having highest value 
+        and with return_peaks, 3D int array of peak frequency bin indexes of shape (time windows, channel groups, top_k)
+        and 3D array of their mean magnitudes
+    """
+    
+    bounds = group_bounds(num_sensor_groups, ch_group_size, last_channel)
+    
+    #frequency bins to calculate and their frequencies in Hz
+    if freq_bands is None:
+        bins = None
+        freqs = _bin_freqs(time_window // 2 + 1, nyq_freq, num_freq)
+    else:
+        bins = band_bins(freq_bands, time_window, nyq_freq)
+        freqs = fftfreq(2 * nyq_freq, time_window)[bins]
+    n_freq = len(freqs)
+    
+    if method == 'loop':
+        abs_sums = np.zeros((num_time_windows, num_sensor_groups, n_freq), dtype=dtype)
+        spect, std_devs, means, max_vals, peak_freq = _condmatrix_loop(some_data, num_time_windows, time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq, dtype, abs_sums, bins, freqs)
+        spect = reduce_bins(reduce_bins(spect, time_bin, time_reduce, axis=0), freq_bin, freq_reduce, axis=-1)
+        if return_peaks:
+            return (spect, std_devs, means, max_vals, peak_freq) + _window_peaks(abs_sums, bounds, top_k, bins)
+        return spect, std_devs, means, max_vals, peak_freq
+    if method != 'vectorized':
+        raise ValueError("Unknown condmatrix method: " + str(method))
+    
+    #calculate the number of channels
+    n_channels = last_channel + 1
+    
+    #view of the data as (time windows, time window size, channels), only whole windows are used
+    windows = some_data[:num_time_windows * time_window, :n_channels].reshape(num_time_windows, time_window, n_channels)
+    
+    if time_bin == 1 and freq_bin == 1:
+        spect, std_devs, abs_sums, ch_sums, max_vals = _condense_tiles(windows, bounds, workers, dtype, bins)
+        peak_freq, peak_freq_val = _peak_freq(abs_sums, freqs)
+        if return_peaks:
+            peak_inds, peak_amps = _window_peaks(abs_sums, bounds, top_k, bins)
+    else:
+        #condense time_bin windows at a time and only keep their reduced rows
+        spect = np.empty((math.ceil(num_time_windows / time_bin), num_sensor_groups, math.ceil(n_freq / freq_bin)), dtype=dtype)
+        std_devs = np.empty((num_time_windows, num_sensor_groups), dtype=dtype)
+        ch_sums = np.zeros(n_channels, dtype=dtype)
+        max_vals = np.zeros(n_channels, dtype=dtype)
+        peak_freq = 0.0
+        peak_freq_val = 0.0
+        if return_peaks:
+            peak_inds = np.empty((num_time_windows, num_sensor_groups, top_k), dtype=int)
+            peak_amps = np.empty((num_time_windows, num_sensor_groups, top_k), dtype=dtype)
+        for row, tw_beg in enumerate(range(0, num_time_windows, time_bin)):
+            tw_end = min(tw_beg + time_bin, num_time_windows)
+            c_spect, c_std_devs, c_abs_sums, c_ch_sums, c_ch_maxs = _condense_tiles(windows[tw_beg:tw_end], bounds, workers, dtype, bins)
+            c_spect = reduce_bins(c_spect, time_bin, time_reduce, axis=0)
+            spect[row] = reduce_bins(c_spect, freq_bin, freq_reduce, axis=-1)[0]
+            std_devs[tw_beg:tw_end] = c_std_devs
+            ch_sums += c_ch_sums
+            np.maximum(max_vals, c_ch_maxs, out=max_vals)
+            
+            #chunks come in order so a later chunk only wins with a strictly higher value
+            c_peak_freq, c_peak_freq_val = _peak_freq(c_abs_sums, freqs)
+            if c_peak_freq_val > peak_freq_val:
+                peak_freq, peak_freq_val = c_peak_freq, c_peak_freq_val
+            if return_peaks:
+                peak_inds[tw_beg:tw_end], peak_amps[tw_beg:tw_end] = _window_peaks(c_abs_sums, bounds, top_k, bins)
+    
+    #calculate means of channels
+    means = ch_sums / some_data.shape[0]
+    
+    if return_peaks:
+        return spect, std_devs, means, max_vals, peak_freq, peak_inds, peak_amps
+    return spect, std_devs, means, max_vals, peak_freq
+
+
+def _condmatrix_loop(some_data, num_time_windows, time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq, dtype=np.float64, abs_sums_out=None, bins=None, freqs=None):
+    """
+    Loop method of condmatrix, iterates through slices of time samples and channels (time windows and channel groups) 
+    from the original data and calculates, condenses and stores the discrete Fourier transform values 
+    in the corresponding place in the spectral tensor. See condmatrix for parameters and returns.
+    The magnitude sums of each time window and channel group are stored in abs_sums_out if given.
+    If bins is given only those frequency bins are kept, with frequencies in Hz freqs.
     """
     
     #create spectral tensor 3D matrix
-    spect = np.zeros((num_time_windows, num_sensor_groups, num_freq))
+    spect = np.zeros((num_time_windows, num_sensor_groups, num_freq if bins is None else len(bins)), dtype=dtype)
     
     #create 2D array to hold the std dev calculations for each ch group in time window
-    std_devs = np.zeros((num_time_windows, num_sensor_groups))
+    std_devs = np.zeros((num_time_windows, num_sensor_groups), dtype=dtype)
     
     #calculate the number of channels
     n_channels = last_channel + 1
     
     #create 1D array to hold the mean value for each channel
-    means = np.zeros(n_channels)
+    means = np.zeros(n_channels, dtype=dtype)
     
     #create 1D array to hold the max value for each channel
-    max_vals = np.zeros(n_channels)
+    max_vals = np.zeros(n_channels, dtype=dtype)
     
     #hold the peak frequency in hz
     peak_freq = 0.0
@@ -295,10 +840,12 @@ def condmatrix(some_data, num_time_windows, time_window, num_sensor_groups, ch_g
                 cindex_end = last_channel + 1
             
             #get slice in matrix of original data for current time window and channel group
-            data_slice = some_data[windex_beg:windex_end, cindex_beg:cindex_end]
+            data_slice = some_data[windex_beg:windex_end, cindex_beg:cindex_end].astype(dtype, copy=False)
             
             #take fft of slice of original data
             slice_fft = rfft(data_slice)
+            if bins is not None:
+                slice_fft = slice_fft[bins]
             
             #check for and get rid of outliers
             #take norms of columns to condense values for outlier check
@@ -345,6 +892,8 @@ def condmatrix(some_data, num_time_windows, time_window, num_sensor_groups, ch_g
             #check and store peak frequency 
             #add abs values along freq axis
             abs_sums = np.sum(np.abs(slice_fft), axis=1)
+            if abs_sums_out is not None:
+                abs_sums_out[tw, ch, :] = abs_sums
             #get max freq index
             max_ind = np.argmax(abs_sums)
             if abs_sums[max_ind] > peak_freq_val : 
@@ -353,10 +902,474 @@ def condmatrix(some_data, num_time_windows, time_window, num_sensor_groups, ch_g
                 #get and store corresponding freq
                 #calculate freq in hz
                 size_freq_bin = nyq_freq / num_freq
-                peak_freq = max_ind * size_freq_bin
+                peak_freq = max_ind * size_freq_bin if bins is None else freqs[max_ind]
     
     #calculate means of channels
     means = means / some_data.shape[0]
     
     return spect, std_devs, means, max_vals, peak_freq
+
+
+def _read_rows(source, beg, end, last_channel, out=None):
+    """
+    Read time samples beg to end (exclusive) of channels 0 to last_channel from an array or a TdmsReader
+    
+    Slicing an np.memmap only gives a view, so the pages are not read until the view is used. If out
+    (an array of at least end - beg rows) is given, array rows are copied into it, which reads them. 
+    TdmsReader.get_data always copies, so out is not used for it.
+    """
+    
+    if hasattr(source, 'get_data'):
+        #TdmsReader indexes are inclusive of the last sample
+        return source.get_data(0, last_channel, beg, end - 1)
+    rows = source[beg:end, :last_channel + 1]
+    if out is None:
+        return np.asarray(rows)
+    out = out[:rows.shape[0]]
+    out[...] = rows
+    return out
+
+
+def _num_rows(source):
+    """
+    Number of time samples in an array or a TdmsReader
+    """
+    
+    if hasattr(source, 'channel_length'):
+        return source.channel_length
+    return source.shape[0]
+
+
+def condmatrix_out_of_core(source, num_time_windows, time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq, spect_out=None, std_out=None, prefetch=True, dtype=np.float64):
+    """
+    Create the same spectral tensor and descriptive statistics as condmatrix from data that does not fit in memory
+    
+    The source is read strictly one time window of rows at a time and each window is condensed with a 
+    StreamingCondenser, so only one time window (two with prefetch, which copies the next window into
+    the other of two window sized buffers on a background thread while the current one is condensed, 
+    so the disk reads happen on that thread) of original data is in memory at once.
+    The rows of the spectral tensor and standard deviations are written to spect_out and std_out as
+    each window is finished, which can be preallocated on disk, for example with np.lib.format.open_memmap
+    or as h5py datasets.
+    
+    Parameters
+    ----------
+    source : array or TdmsReader
+        2D np.memmap (or any array that can be sliced by rows) with rows as time samples and columns as 
+        channels, or a TdmsReader
+    num_time_windows : int
+        Number of time windows for data
+    time_window : int
+        Number of time samples per time window
+    num_sensor_groups : int
+        Number of channel groups for data
+    ch_group_size : int
+        Number of channels per channel group
+    last_channel : int
+        Index of last channel in data
+    num_freq : int
+        Number of frequency bins calculated from time samples and window size 
+    nyq_freq : int
+        Nyquist frequency of original data aka half of sampling frequency
+    spect_out : array
+        Array of shape (num_time_windows, num_sensor_groups, num_freq) to write the spectral tensor to, 
+        allocated in memory if None
+    std_out : array
+        Array of shape (num_time_windows, num_sensor_groups) to write the standard deviations to, 
+        allocated in memory if None
+    prefetch : bool
+        Read the next time window on a background thread
+    dtype : data-type
+        Real floating point type for the calculations and results, np.float64 (default) or np.float32
+    
+    Returns
+    -------
+    tuple
+        spect_out, std_out, 1D array of means for each channel, 1D array of max value for each channel, 
+        float of peak frequency having highest value
+    """
+    
+    if spect_out is None:
+        spect_out = np.zeros((num_time_windows, num_sensor_groups, num_freq), dtype=dtype)
+    if std_out is None:
+        std_out = np.zeros((num_time_windows, num_sensor_groups), dtype=dtype)
+    
+    stream = StreamingCondenser(time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq, dtype=dtype)
+    
+    #two buffers used in turn, one being condensed while the next window is read into the other
+    buffers = None
+    if prefetch and not hasattr(source, 'get_data'):
+        buffers = [np.empty((time_window, last_channel + 1), dtype=source.dtype) for _ in range(2)]
+    
+    def read_window(tw):
+        out = buffers[tw % 2] if buffers is not None else None
+        return _read_rows(source, tw * time_window, (tw + 1) * time_window, last_channel, out)
+    
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        next_window = None
+        if prefetch and num_time_windows > 0:
+            next_window = pool.submit(read_window, 0)
+        for tw in range(num_time_windows):
+            if prefetch:
+                window = next_window.result()
+                if tw + 1 < num_time_windows:
+                    next_window = pool.submit(read_window, tw + 1)
+            else:
+                window = read_window(tw)
+            
+            spect_rows, std_rows = stream.push(window)
+            spect_out[tw] = spect_rows[0]
+            std_out[tw] = std_rows[0]
+            #drop the reference so at most the current and the prefetched window are held
+            window = None
+    
+    max_vals, peak_freq = stream.max_vals, stream.peak_freq
+    
+    #condmatrix divides by every time sample in the data, not only the ones in whole time windows
+    n_rows = _num_rows(source)
+    means = stream.means * (stream.n_samples / n_rows) if n_rows > 0 else stream.means
+    
+    return spect_out, std_out, means, max_vals, peak_freq
+
+
+class StreamingCondenser(object):
+    """
+    Condense data as it arrives, one block of time samples at a time
+    
+    Blocks of any number of time samples (for example the frames fetched from a treble server) are 
+    pushed in order. As soon as a time window is full its rows of the spectral tensor and standard 
+    deviations are returned, so only one time window of original data is held at once. The channel 
+    means and maximums and the peak frequency are accumulated as windows complete, and after the 
+    last block they match what condmatrix gives for the whole array.
+    
+    Parameters
+    ----------
+    time_window : int
+        Number of time samples per time window
+    num_sensor_groups : int
+        Number of channel groups for data
+    ch_group_size : int
+        Number of channels per channel group
+    last_channel : int
+        Index of last channel in data
+    num_freq : int
+        Number of frequency bins in one time window
+    nyq_freq : int
+        Nyquist frequency of original data aka half of sampling frequency
+    dtype : data-type
+        Real floating point type for the calculations and results, np.float64 (default) or np.float32
+    """
+    
+    def __init__(self, time_window, num_sensor_groups, ch_group_size, last_channel, num_freq, nyq_freq, dtype=np.float64):
+        self.time_window = time_window
+        self.num_sensor_groups = num_sensor_groups
+        self.last_channel = last_channel
+        self.num_freq = num_freq
+        self.nyq_freq = nyq_freq
+        self.dtype = np.dtype(dtype)
+        self.n_channels = last_channel + 1
+        self._bounds = group_bounds(num_sensor_groups, ch_group_size, last_channel)
+        
+        #holds the samples of a time window that is not full yet
+        self._buffer = None
+        self._n_buffered = 0
+        
+        #number of time samples pushed and time windows completed
+        self.n_samples = 0
+        self.n_windows = 0
+        
+        self._ch_sums = np.zeros(self.n_channels, dtype=self.dtype)
+        self.max_vals = np.zeros(self.n_channels, dtype=self.dtype)
+        self.peak_freq = 0.0
+        self._peak_freq_val = 0.0
+        self._freqs = _bin_freqs(time_window // 2 + 1, nyq_freq, num_freq)
+    
+    def push(self, block):
+        """
+        Add a block of time samples and condense every time window it completes
+        
+        Parameters
+        ----------
+        block : array
+            2D array of original data, with rows as time samples and columns as channels
+        
+        Returns
+        -------
+        tuple
+            3D array of spectral tensor rows and 2D array of standard deviation rows for the completed
+            time windows, both with zero rows if no time window was completed
+        """
+        
+        block = block[:, :self.n_channels]
+        self.n_samples += block.shape[0]
+        if self._buffer is None:
+            self._buffer = np.empty((self.time_window, self.n_channels), dtype=self.dtype)
+        
+        spects = []
+        stds = []
+        start = 0
+        
+        #finish the partly filled time window first
+        if self._n_buffered > 0:
+            start = min(self.time_window - self._n_buffered, block.shape[0])
+            self._buffer[self._n_buffered:self._n_buffered + start] = block[:start]
+            self._n_buffered += start
+            if self._n_buffered == self.time_window:
+                self._condense(self._buffer[np.newaxis], spects, stds)
+                self._n_buffered = 0
+        
+        #condense the whole time windows straight from the block
+        n_whole = (block.shape[0] - start) // self.time_window
+        if n_whole > 0:
+            end = start + n_whole * self.time_window
+            self._condense(block[start:end].reshape(n_whole, self.time_window, self.n_channels), spects, stds)
+            start = end
+        
+        #keep the leftover samples for the next time window
+        n_left = block.shape[0] - start
+        if n_left > 0:
+            self._buffer[:n_left] = block[start:]
+            self._n_buffered = n_left
+        
+        if len(spects) == 0:
+            return np.zeros((0, self.num_sensor_groups, self.num_freq), dtype=self.dtype), np.zeros((0, self.num_sensor_groups), dtype=self.dtype)
+        
+        return np.concatenate(spects), np.concatenate(stds)
+    
+    def _condense(self, windows, spects, stds):
+        """Condense whole time windows and update the accumulated statistics."""
+        
+        spect, std_devs, abs_sums, ch_sums, ch_maxs = _condense_windows(windows, self._bounds, self.dtype)
+        spects.append(spect)
+        stds.append(std_devs)
+        
+        self._ch_sums += ch_sums
+        np.maximum(self.max_vals, ch_maxs, out=self.max_vals)
+        
+        #windows come in order so a later window only wins with a strictly higher value
+        peak_freq, peak_freq_val = _peak_freq(abs_sums, self._freqs)
+        if peak_freq_val > self._peak_freq_val:
+            self._peak_freq_val = peak_freq_val
+            self.peak_freq = peak_freq
+        
+        self.n_windows += windows.shape[0]
+    
+    def _get_means(self):
+        if self.n_samples == 0:
+            return np.zeros(self.n_channels, dtype=self.dtype)
+        return self._ch_sums / self.n_samples
+    
+    means = property(_get_means)
+    
+    def result(self):
+        """
+        Get the statistics accumulated over every block pushed so far
+        
+        Samples left over in a time window that was not completed are counted for the means 
+        (like condmatrix does for samples past the last whole time window) but not transformed.
+        
+        Returns
+        -------
+        tuple
+            1D array of means for each channel, 1D array of max value for each channel, float of peak frequency
+        """
+        
+        return self.means, self.max_vals.copy(), self.peak_freq
+
+
+class TimeStats(object):
+    """
+    Accumulate the time domain statistics of each channel over blocks of time samples
+    
+    Each block is reduced to a count, mean, sum of squared differences from the mean (M2), minimum 
+    and maximum for each channel, and combined with the totals using the parallel form of Welford's 
+    update (Chan et al.). Large blocks are split into blocks of block_size rows, so the data is only 
+    read from memory once. Accumulators filled from separate chunks or workers can be combined with merge.
+    Sums are kept in float64 whatever the type of the data.
+    
+    Parameters
+    ----------
+    n_channels : int
+        Number of channels in data
+    block_size : int
+        Number of time samples reduced at once
+    """
+    
+    def __init__(self, n_channels, block_size=1024):
+        self.n_channels = n_channels
+        self.block_size = block_size
+        self.n_samples = 0
+        self._mean = np.zeros(n_channels)
+        self._m2 = np.zeros(n_channels)
+        self._min = np.full(n_channels, np.inf)
+        self._max = np.full(n_channels, -np.inf)
+    
+    def update(self, block):
+        """
+        Add a block of time samples
+        
+        Parameters
+        ----------
+        block : array
+            2D array of original data, with rows as time samples and columns as channels
+        """
+        
+        for beg in range(0, block.shape[0], self.block_size):
+            sub = block[beg:beg + self.block_size].astype(np.float64, copy=False)
+            sub_mean = np.mean(sub, axis=0)
+            diffs = sub - sub_mean
+            self._combine(sub.shape[0], sub_mean, np.einsum('ij,ij->j', diffs, diffs), np.min(sub, axis=0), np.max(sub, axis=0))
+    
+    def merge(self, other):
+        """
+        Add the statistics accumulated by another TimeStats for the same channels
+        
+        Parameters
+        ----------
+        other : TimeStats
+            Accumulator filled with a different set of time samples
+        """
+        
+        self._combine(other.n_samples, other._mean, other._m2, other._min, other._max)
+    
+    def _combine(self, n, mean, m2, mins, maxs):
+        """Combine the count, mean, M2, minimums and maximums of a set of samples with the totals."""
+        
+        if n == 0:
+            return
+        total = self.n_samples + n
+        delta = mean - self._mean
+        self._mean += delta * (n / total)
+        self._m2 += m2 + delta * delta * (self.n_samples * n / total)
+        np.minimum(self._min, mins, out=self._min)
+        np.maximum(self._max, maxs, out=self._max)
+        self.n_samples = total
+    
+    def _get_mean(self):
+        return self._mean.copy()
+    
+    def _get_std(self):
+        return np.sqrt(self._m2 / self.n_samples)
+    
+    def _get_rms(self):
+        return np.sqrt(self._m2 / self.n_samples + self._mean * self._mean)
+    
+    def _get_min(self):
+        return self._min.copy()
+    
+    def _get_max(self):
+        return self._max.copy()
+    
+    mean = property(_get_mean)
+    std = property(_get_std)
+    rms = property(_get_rms)
+    min = property(_get_min)
+    max = property(_get_max)
+
+
+class CondenserPlan(object):
+    """
+    Condense arrays of the same shape repeatedly, for example every fetch of a long running acquisition loop
+    
+    The number of time windows, channel groups and frequency bins, the channel group boundaries, the
+    frequency of each bin and the output arrays are all worked out once when the plan is made. Each call
+    to execute then gives the same results as condmatrix, written into the plan's output arrays (or the
+    arrays passed as out) instead of new ones. The rFFT and reductions still use temporary arrays of 
+    the size of one transform.
+    
+    Parameters
+    ----------
+    n_time : int
+        Number of time samples in each data array
+    n_channels : int
+        Number of channels in each data array
+    time_window : int
+        Number of time samples per time window
+    ch_group_size : int
+        Number of channels per channel group
+    fs : float
+        Sampling frequency of original data in Hz
+    dtype : data-type
+        Real floating point type for the calculations and results, np.float64 (default) or np.float32
+    workers : int
+        Number of threads, None or 1 to run on the calling thread
+    freq_bands : list
+        (low, high) frequency pairs in Hz to calculate, every frequency bin if None
+    """
+    
+    def __init__(self, n_time, n_channels, time_window, ch_group_size, fs, dtype=np.float64, workers=None, freq_bands=None):
+        self.n_time = n_time
+        self.n_channels = n_channels
+        self.time_window = time_window
+        self.ch_group_size = ch_group_size
+        self.dtype = np.dtype(dtype)
+        self.workers = workers
+        
+        self.num_time_windows = calc_num_time_win(n_time, time_window)
+        self.num_sensor_groups = calc_num_ch_groups(n_channels, ch_group_size)
+        self.num_freq = calc_num_freq(n_time, self.num_time_windows) if self.num_time_windows > 0 else time_window // 2 + 1
+        self.nyq_freq = fs / 2
+        self.last_channel = n_channels - 1
+        self.bounds = group_bounds(self.num_sensor_groups, ch_group_size, self.last_channel)
+        
+        #frequency bins to calculate and their frequencies in Hz
+        if freq_bands is None:
+            self.bins = None
+            self.freqs = _bin_freqs(time_window // 2 + 1, self.nyq_freq, self.num_freq)
+        else:
+            self.bins = band_bins(freq_bands, time_window, self.nyq_freq)
+            self.freqs = fftfreq(fs, time_window)[self.bins]
+        
+        self.spect, self.std_devs, self.means, self.max_vals = self.empty_outputs()
+        self._abs_sums = np.empty((self.num_time_windows, self.num_sensor_groups, len(self.freqs)), dtype=self.dtype)
+    
+    def empty_outputs(self):
+        """
+        Allocate a new set of output arrays for execute
+        
+        Returns
+        -------
+        tuple
+            3D spectral tensor, 2D array of standard deviations, 1D arrays of means and max values for each channel
+        """
+        
+        spect = np.empty((self.num_time_windows, self.num_sensor_groups, len(self.freqs)), dtype=self.dtype)
+        std_devs = np.empty((self.num_time_windows, self.num_sensor_groups), dtype=self.dtype)
+        means = np.empty(self.n_channels, dtype=self.dtype)
+        max_vals = np.empty(self.n_channels, dtype=self.dtype)
+        
+        return spect, std_devs, means, max_vals
     
+    def execute(self, data, out=None):
+        """
+        Create the spectral tensor and descriptive statistics of one data array
+        
+        Parameters
+        ----------
+        data : array
+            2D array of original data of shape (n_time, n_channels), with rows as time samples and columns as channels
+        out : tuple
+            Spectral tensor, standard deviation, mean and max value arrays to write to (see empty_outputs),
+            the plan's own arrays if None. The plan's arrays are overwritten by the next call.
+        
+        Returns
+        -------
+        tuple
+            3D spectral tensor, 2D array of standard deviation values, 1D array of means for each channel,
+            1D array of max value for each channel, float of peak frequency having highest value 
+        """
+        
+        if data.shape[0] != self.n_time or data.shape[1] < self.n_channels:
+            raise ValueError("Data shape " + str(data.shape) + " does not match the plan (" + str(self.n_time) + ", " + str(self.n_channels) + ")")
+        if out is None:
+            out = (self.spect, self.std_devs, self.means, self.max_vals)
+        spect, std_devs, means, max_vals = out
+        
+        windows = data[:self.num_time_windows * self.time_window, :self.n_channels].reshape(self.num_time_windows, self.time_window, self.n_channels)
+        _condense_tiles(windows, self.bounds, self.workers, self.dtype, self.bins, out=(spect, std_devs, self._abs_sums, means, max_vals))
+        
+        #means were filled with the magnitude sums of each channel
+        means /= self.n_time
+        peak_freq, peak_freq_val = _peak_freq(self._abs_sums, self.freqs)
+        
+        return spect, std_devs, means, max_vals, peak_freq
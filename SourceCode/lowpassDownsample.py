@@ -6,10 +6,30 @@ Functions
 ---------
 fetchT15LocalServerData - fetch a frame of data from the connected server and determine the attributes
 getFileData - get the attributes from a given file of saved data
+iterFileData - read the data of a given file of saved data in blocks of time samples aligned to its HDF5 chunks
+lowpassDownsampleFile - lowpass and downsample the data of a given file one block at a time
 runLpAndDs - run lowpass and downsample without applying a window taper (old version)
 runLowpassAndDownsample - run lowpass and downsample and apply a cosine window taper (new version)
+polyphaseTaps - design the FIR anti-aliasing filter used by polyphaseDownsample
+polyphaseDownsample - lowpass and downsample with a polyphase FIR filter that only computes the kept samples
+decimationStages - split a downsample factor into the factors of smaller stages
+stageFilter - design (once) the anti-aliasing filter for one decimation stage
+decimationPlan - list the stages, sampling frequencies and filters used by cascadeDownsample
+cascadeDownsample - lowpass and downsample in several smaller stages
+downsampledLength - number of samples cascadeDownsample gives for a number of original samples
+parallelDownsample - run cascadeDownsample on blocks of channels on a thread pool
+spaceTimeDownsample - lowpass and downsample over time and then over channels
+amplitudeSpectrum - calculate the amplitude spectrums of some channels with one FFT
 plotAmplitudeSpectrum - plot the amplitude spectrums of the original and downsampled data
 plotLowpassDownsample - plot the original and downsampled signals together (optionally between a given time frame)
+traceEnvelope - reduce a trace to the min and max of each pixel so plotting it looks the same as plotting every sample
+rasterReduce - reduce a 2D raster to pixel resolution with the largest magnitude or rms value of each block
+sampleValues - take a random sample of the values of an array
+samplePercentile - estimate a percentile of an array from a random sample of its values
+
+Classes
+-------
+StreamingDecimator - lowpass and downsample consecutive blocks of data as one seamless stream
 
 Author(s)
 ---------
@@ -19,17 +39,21 @@ Brandon Pearl
 import numpy as np
 import matplotlib.pyplot as plt
 import scipy.signal
-from T15 import server_func
 import condenser
-from scipy.signal import iirfilter, zpk2sos, sosfilt, decimate
+from scipy.signal import iirfilter, zpk2sos, sosfilt, sosfilt_zi, sosfiltfilt, decimate, firwin, resample_poly
 import warnings
 from scipy.fft import rfft, rfftfreq
 import sys
 import time
 import h5py
+import functools
+import math
+from concurrent.futures import ThreadPoolExecutor
 plt.switch_backend('agg')
 
 def fetchT15LocalServerData():
+    #only needed when connected to the server, and it needs the treble package
+    from T15 import server_func
     client = server_func.setup_server();
     data, md = server_func.get_data(client,1);
     dT = md['dT'];
@@ -49,13 +73,106 @@ def getFileData(fileName):
     return (data, sampling_duration, number_time_samples,sampling_freq)  
 
 
+def iterFileData(fileName, blockSamples=8192):
+    """
+    Read the data of a given file of saved data in blocks of time samples instead of all at once
+    
+    When the dataset is chunked the blocks are a whole number of chunks long (at least blockSamples 
+    rounded up), so every chunk is read and decompressed only once.
+    
+    Parameters
+    ----------
+    fileName : string
+        Name of the hdf5 file, with the data in data_product/data as time samples by channels
+    blockSamples : int
+        Smallest number of time samples in each block
+    
+    Yields
+    ------
+    array
+        2D array of the next block of data with rows as time samples and columns as channels
+    """
+    
+    with h5py.File(fileName, 'r') as f:
+        dset = f['data_product']['data']
+        n = dset.shape[0]
+        if dset.chunks is not None:
+            chunkSamples = dset.chunks[0]
+            blockSamples = -(-blockSamples // chunkSamples) * chunkSamples
+        for beg in range(0, n, blockSamples):
+            yield dset[beg:beg + blockSamples]
+
+
+def lowpassDownsampleFile(fileName, integerDownsampleFactor, blockSamples=8192, outFile=None, outName='lowpass_and_downsample'):
+    """
+    Lowpass and downsample the data of a given file one block at a time with a StreamingDecimator
+    
+    Only one block of the original data is held in memory at a time. The downsampled data is either
+    returned or, if outFile is given, appended to a dataset in that file as each block is done. A dataset
+    of the same name already in outFile is replaced.
+    
+    Parameters
+    ----------
+    fileName : string
+        Name of the hdf5 file of saved data, see getFileData
+    integerDownsampleFactor : int
+        Factor to downsample by
+    blockSamples : int
+        Smallest number of time samples read at a time, see iterFileData
+    outFile : string
+        Name of an hdf5 file to write the downsampled data to, returned instead if None
+    outName : string
+        Name of the dataset in outFile
+    
+    Returns
+    -------
+    tuple
+        1D array of times in seconds of the downsampled samples, 2D array of downsampled data with rows 
+        as time samples and columns as channels (None if written to outFile), downsampled sampling frequency
+    """
+    
+    with h5py.File(fileName, 'r') as f:
+        sampling_freq = 1 / f.attrs['dt_computer']
+    decimator = StreamingDecimator(integerDownsampleFactor, sampling_freq)
+    
+    times = []
+    blocks = []
+    hf = None
+    if outFile is not None:
+        hf = h5py.File(outFile, 'a')
+        #replace the output of an earlier run instead of appending to it
+        if outName in hf:
+            del hf[outName]
+    try:
+        for block in iterFileData(fileName, blockSamples):
+            downsampled_time, downsampled = decimator.process(block)
+            times.append(downsampled_time)
+            if hf is None:
+                blocks.append(downsampled)
+            else:
+                if outName not in hf:
+                    hf.create_dataset(outName, shape=(0, downsampled.shape[1]), maxshape=(None, downsampled.shape[1]), dtype=downsampled.dtype, chunks=True)
+                dset = hf[outName]
+                dset.resize(dset.shape[0] + downsampled.shape[0], axis=0)
+                dset[-downsampled.shape[0]:] = downsampled
+        if hf is not None and outName in hf:
+            hf[outName].attrs['downsampled_sampling_freq'] = decimator.downsampledFreq
+    finally:
+        if hf is not None:
+            hf.close()
+    
+    downsampled_time = np.concatenate(times) if times else np.zeros(0)
+    downsampled_signal = np.concatenate(blocks) if hf is None and blocks else None
+    return (downsampled_time, downsampled_signal, decimator.downsampledFreq)
+
+
 def runLowpassAndDownsample(data, sampling_duration, number_time_samples, sampling_freq, integerDownsampleFactor):
     downsampled_sampling_freq = sampling_freq/integerDownsampleFactor
     time = np.linspace(0, sampling_duration, number_time_samples, endpoint=False);
     data_T = np.transpose(data);
     #print(data_T.shape, file = sys.stderr);
     n = len(data_T[0])
-    window = scipy.signal.cosine(n)
+    window = scipy.signal.windows.cosine(n)
     data_T = data_T * window
     downsampled_signal = scipy.signal.decimate(data_T,integerDownsampleFactor,ftype="iir");
     #downsampled_signal = scipy.signal.decimate(downsampled_signal1,integerDownsampleFactor,ftype="iir");
@@ -63,33 +180,598 @@ def runLowpassAndDownsample(data, sampling_duration, number_time_samples, sampli
     downsampled_time = np.linspace(0,sampling_duration,newNumSamples, endpoint=False);
     return (time,data,downsampled_time, downsampled_signal,sampling_freq,downsampled_sampling_freq)
     
+
+def polyphaseTaps(integerDownsampleFactor, window=('kaiser', 5.0)):
+    """
+    Design the FIR anti-aliasing filter polyphaseDownsample uses, the same design as scipy.signal.resample_poly
+    
+    Parameters
+    ----------
+    integerDownsampleFactor : int
+        Factor to downsample by
+    window : str or tuple
+        Window given to scipy.signal.firwin for the filter design
+    
+    Returns
+    -------
+    array
+        1D array of filter coefficients with the cutoff at the new Nyquist frequency
+    """
+    
+    half_len = 10 * integerDownsampleFactor
+    return firwin(2 * half_len + 1, 1.0 / integerDownsampleFactor, window=window)
+
+
+def polyphaseDownsample(data, integerDownsampleFactor, window=('kaiser', 5.0), taps=None, axis=0):
+    """
+    Lowpass and downsample with a polyphase FIR filter
+    
+    The filter is split into integerDownsampleFactor phases and only evaluated at the samples that
+    are kept (scipy.signal.upfirdn through resample_poly), instead of filtering every sample and then 
+    throwing away all but one in integerDownsampleFactor of them like scipy.signal.decimate. The 
+    filter is linear phase and its delay is removed, so the output lines up with the original data.
+    
+    Parameters
+    ----------
+    data : array
+        Array of data, for example 2D with rows as time samples and columns as channels
+    integerDownsampleFactor : int
+        Factor to downsample by
+    window : str or tuple
+        Window used to design the filter with polyphaseTaps, ignored if taps is given
+    taps : array
+        1D array of FIR filter coefficients to use instead of designing them
+    axis : int
+        Time axis of data
+    
+    Returns
+    -------
+    array
+        Downsampled data with ceil(n / integerDownsampleFactor) samples along axis
+    """
+    
+    if taps is None:
+        taps = polyphaseTaps(integerDownsampleFactor, window)
+    return resample_poly(data, 1, integerDownsampleFactor, axis=axis, window=np.asarray(taps))
+
+
+def decimationStages(integerDownsampleFactor, maxStageFactor=5):
+    """
+    Split a downsample factor into the factors of smaller stages, for example 8 into [4, 2] or 100 into [5, 5, 4]
+    
+    The prime factors are packed largest first into as few stages as possible with each stage 
+    at most maxStageFactor. A prime factor larger than maxStageFactor is its own stage.
+    
+    Parameters
+    ----------
+    integerDownsampleFactor : int
+        Factor to downsample by
+    maxStageFactor : int
+        Largest downsample factor of one stage
+    
+    Returns
+    -------
+    list
+        Downsample factor of each stage from largest to smallest, their product is integerDownsampleFactor
+    """
+    
+    primes = []
+    n = integerDownsampleFactor
+    p = 2
+    while p * p <= n:
+        while n % p == 0:
+            primes.append(p)
+            n //= p
+        p += 1
+    if n > 1:
+        primes.append(n)
+    
+    stages = []
+    for p in sorted(primes, reverse=True):
+        for i in range(len(stages)):
+            if stages[i] * p <= maxStageFactor:
+                stages[i] *= p
+                break
+        else:
+            stages.append(p)
+    return sorted(stages, reverse=True)
+
+
+@functools.lru_cache(maxsize=64)
+def stageFilter(samplingFreq, integerDownsampleFactor, order=8, ftype='cheby1'):
+    """
+    Design the anti-aliasing filter for one decimation stage with the cutoff at 0.8 of the new Nyquist frequency
+    
+    Designs are cached on (samplingFreq, integerDownsampleFactor, order, ftype) so later calls skip
+    iirfilter and zpk2sos. The returned array is shared between callers so it should not be changed.
+    
+    Parameters
+    ----------
+    samplingFreq : float
+        Sampling frequency of the data going into the stage in Hz
+    integerDownsampleFactor : int
+        Factor the stage downsamples by
+    order : int
+        Order of the filter
+    ftype : str
+        Type of IIR filter given to scipy.signal.iirfilter, cheby1 matches scipy.signal.decimate
+    
+    Returns
+    -------
+    array
+        Second order sections of the filter
+    """
+    
+    cutoff = 0.8 * samplingFreq / (2 * integerDownsampleFactor)
+    z, p, k = iirfilter(order, cutoff, rp=0.05, rs=60, btype='lowpass', ftype=ftype, output='zpk', fs=samplingFreq)
+    return zpk2sos(z, p, k)
+
+
+def decimationPlan(integerDownsampleFactor, samplingFreq, maxStageFactor=5, order=8, ftype='cheby1'):
+    """
+    List the stages cascadeDownsample uses
+    
+    Parameters
+    ----------
+    integerDownsampleFactor : int
+        Factor to downsample by
+    samplingFreq : float
+        Sampling frequency of the original data in Hz
+    maxStageFactor : int
+        Largest downsample factor of one stage
+    order : int
+        Order of the filter of each stage
+    ftype : str
+        Type of IIR filter of each stage
+    
+    Returns
+    -------
+    list
+        One tuple per stage of (downsample factor, sampling frequency into the stage, second order sections)
+    """
+    
+    plan = []
+    fs = samplingFreq
+    for factor in decimationStages(integerDownsampleFactor, maxStageFactor):
+        plan.append((factor, fs, stageFilter(fs, factor, order, ftype)))
+        fs = fs / factor
+    return plan
+
+
+def cascadeDownsample(data, integerDownsampleFactor, samplingFreq, maxStageFactor=5, order=8, ftype='cheby1', axis=0):
+    """
+    Lowpass and downsample in several smaller stages
+    
+    Each stage filters forwards and backwards like scipy.signal.decimate with zero_phase=True 
+    and keeps every factor-th sample. Large factors are split so no single filter has a cutoff 
+    too close to zero, which makes high order IIR filters unstable, and the later stages run on 
+    less data.
+    
+    Parameters
+    ----------
+    data : array
+        Array of data, for example 2D with rows as time samples and columns as channels
+    integerDownsampleFactor : int
+        Factor to downsample by
+    samplingFreq : float
+        Sampling frequency of the original data in Hz
+    maxStageFactor : int
+        Largest downsample factor of one stage
+    order : int
+        Order of the filter of each stage
+    ftype : str
+        Type of IIR filter of each stage
+    axis : int
+        Time axis of data
+    
+    Returns
+    -------
+    array
+        Downsampled data with ceil(n / integerDownsampleFactor) samples along axis
+    """
+    
+    downsampled = data
+    for factor, fs, sos in decimationPlan(integerDownsampleFactor, samplingFreq, maxStageFactor, order, ftype):
+        filtered = sosfiltfilt(sos, downsampled, axis=axis)
+        keep = [slice(None)] * filtered.ndim
+        keep[axis] = slice(None, None, factor)
+        downsampled = filtered[tuple(keep)]
+    return downsampled
+
+
+def downsampledLength(numberTimeSamples, integerDownsampleFactor, maxStageFactor=5):
+    """
+    Number of samples cascadeDownsample gives for a number of original samples
+    
+    Parameters
+    ----------
+    numberTimeSamples : int
+        Number of original time samples
+    integerDownsampleFactor : int
+        Factor to downsample by
+    maxStageFactor : int
+        Largest downsample factor of one stage
+    
+    Returns
+    -------
+    int
+        Number of downsampled time samples
+    """
     
+    n = numberTimeSamples
+    for factor in decimationStages(integerDownsampleFactor, maxStageFactor):
+        n = -(-n // factor)
+    return n
+
+
+def parallelDownsample(data, integerDownsampleFactor, samplingFreq, workers=None, channelBlock=256, out=None, means=None, maxStageFactor=5, order=8, ftype='cheby1'):
+    """
+    Lowpass and downsample blocks of channels with cascadeDownsample on a thread pool
+    
+    scipy's filters release the GIL so the blocks run at the same time. Every channel is filtered 
+    on its own, so the output is exactly the same as cascadeDownsample of all the channels at once
+    whatever the number of workers or block size.
+    
+    The data is used as it is stored, rows as time samples, without a transpose, taper or full 
+    size copy. Subtracting the means is done on each block as it is copied for filtering and the 
+    result is written straight into out, which can be a transposed view (for example of an array 
+    of channels by time samples). Apart from out, the peak memory is about four arrays of 
+    (number of time samples, channelBlock) per worker for the block copy and the padded forward 
+    and backward filter passes, instead of several copies of all the data.
+    
+    Parameters
+    ----------
+    data : array
+        2D array of data with rows as time samples and columns as channels
+    integerDownsampleFactor : int
+        Factor to downsample by
+    samplingFreq : float
+        Sampling frequency of the original data in Hz
+    workers : int
+        Number of threads, None or 1 to run the blocks one after another on the calling thread
+    channelBlock : int
+        Number of channels in each block
+    out : array
+        2D array of shape (downsampledLength, number of channels) to write the downsampled data to, allocated if None
+    means : array
+        1D array of the value to subtract from each channel before filtering, for example its mean
+    maxStageFactor : int
+        Largest downsample factor of one stage
+    order : int
+        Order of the filter of each stage
+    ftype : str
+        Type of IIR filter of each stage
+    
+    Returns
+    -------
+    array
+        2D array of downsampled data with rows as time samples and columns as channels
+    """
+    
+    n_out = downsampledLength(data.shape[0], integerDownsampleFactor, maxStageFactor)
+    if out is None:
+        out = np.empty((n_out, data.shape[1]), dtype=np.result_type(data.dtype, np.float64))
+    elif out.shape != (n_out, data.shape[1]):
+        raise ValueError("out has shape " + str(out.shape) + ", expected " + str((n_out, data.shape[1])))
+    
+    def run_block(beg):
+        end = min(beg + channelBlock, data.shape[1])
+        block = data[:, beg:end]
+        if means is not None:
+            block = block - means[beg:end]
+        out[:, beg:end] = cascadeDownsample(block, integerDownsampleFactor, samplingFreq, maxStageFactor, order, ftype)
+    
+    starts = range(0, data.shape[1], channelBlock)
+    if workers is None or workers <= 1:
+        for beg in starts:
+            run_block(beg)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            #list() so an exception in any block is raised here
+            list(pool.map(run_block, starts))
+    return out
+
+
+def spaceTimeDownsample(data, integerDownsampleFactor, spaceDownsampleFactor, samplingFreq, timeOut=None, means=None, workers=None, channelBlock=256, window=('kaiser', 5.0), maxStageFactor=5):
+    """
+    Lowpass and downsample over time and then over channels
+    
+    The full data is only read once, by parallelDownsample over time. The anti-aliasing filter and 
+    downsampling over channels (polyphaseDownsample along the channel axis) then runs on the much 
+    smaller time downsampled data, which is returned as well so it does not have to be calculated again.
+    
+    Parameters
+    ----------
+    data : array
+        2D array of data with rows as time samples and columns as channels
+    integerDownsampleFactor : int
+        Factor to downsample time by
+    spaceDownsampleFactor : int
+        Factor to downsample channels by
+    samplingFreq : float
+        Sampling frequency of the original data in Hz
+    timeOut : array
+        2D array to write the time downsampled data to, see parallelDownsample
+    means : array
+        1D array of the value to subtract from each channel before filtering
+    workers : int
+        Number of threads for the time downsampling
+    channelBlock : int
+        Number of channels in each block of the time downsampling
+    window : str or tuple
+        Window used to design the FIR filter over channels
+    maxStageFactor : int
+        Largest downsample factor of one stage of the time downsampling, see cascadeDownsample
+    
+    Returns
+    -------
+    tuple
+        2D array of data downsampled over time (time samples by channels), 2D array of data downsampled
+        over time and channels (time samples by ceil(number of channels / spaceDownsampleFactor))
+    """
+    
+    time_ds = parallelDownsample(data, integerDownsampleFactor, samplingFreq, workers, channelBlock, timeOut, means, maxStageFactor)
+    if spaceDownsampleFactor == 1:
+        return time_ds, time_ds
+    return time_ds, polyphaseDownsample(time_ds, spaceDownsampleFactor, window, axis=1)
+    
+
+class StreamingDecimator(object):
+    """
+    Lowpass and downsample consecutive blocks of data (for example each fetch from the server) as one stream
+    
+    The anti-aliasing filter comes from stageFilter, by default the same order 8 Chebyshev type I filter 
+    scipy.signal.decimate uses for ftype="iir", and is run with sosfilt along the time axis. The filter state of every channel 
+    is kept between blocks and the samples kept are counted from the start of the stream, so blocks 
+    of any length give exactly the same output as filtering all the data at once, with no gaps, 
+    edge effects or window taper. The filter state is started at the steady state of the first sample 
+    of each channel so a DC offset does not cause a startup transient. 
+    
+    Unlike decimate the filter only runs forward, so the output is delayed by the group delay of the
+    filter (a few samples of the original data in the pass band).
+    
+    Parameters
+    ----------
+    integerDownsampleFactor : int
+        Factor to downsample by
+    samplingFreq : float
+        Sampling frequency of the original data in Hz
+    order : int
+        Order of the anti-aliasing filter
+    ftype : str
+        Type of IIR filter given to stageFilter
+    startTime : float
+        Time in seconds of the first sample of the stream
+    """
+    
+    def __init__(self, integerDownsampleFactor, samplingFreq, order=8, ftype='cheby1', startTime=0.0):
+        self.factor = integerDownsampleFactor
+        self.samplingFreq = samplingFreq
+        self.downsampledFreq = samplingFreq / integerDownsampleFactor
+        self.startTime = startTime
+        self.sos = stageFilter(samplingFreq, integerDownsampleFactor, order, ftype)
+        self.zi = None
+        #number of original samples taken in and downsampled samples given out so far
+        self.nIn = 0
+        self.nOut = 0
+    
+    def process(self, block):
+        """
+        Lowpass and downsample the next block of the stream
+        
+        Parameters
+        ----------
+        block : array
+            2D array of data with rows as time samples and columns as channels
+        
+        Returns
+        -------
+        tuple
+            1D array of times in seconds of the downsampled samples, 2D array of downsampled data 
+            with rows as time samples and columns as channels
+        """
+        
+        if block.shape[0] == 0:
+            return np.zeros(0), np.zeros((0,) + block.shape[1:])
+        if self.zi is None:
+            #steady state for the first sample of each channel, shape (sections, 2, channels)
+            self.zi = sosfilt_zi(self.sos)[:, :, np.newaxis] * block[0]
+        filtered, self.zi = sosfilt(self.sos, block, axis=0, zi=self.zi)
+        
+        #keep every factor-th sample of the whole stream, the first one in this block may not be at index 0
+        first = (-self.nIn) % self.factor
+        downsampled = filtered[first::self.factor]
+        
+        downsampledTime = self.startTime + (self.nOut + np.arange(downsampled.shape[0])) / self.downsampledFreq
+        self.nIn += block.shape[0]
+        self.nOut += downsampled.shape[0]
+        return downsampledTime, downsampled
+    
+    def reset(self, startTime=0.0):
+        """
+        Clear the filter state and sample counts to start a new stream
+        
+        Parameters
+        ----------
+        startTime : float
+            Time in seconds of the first sample of the new stream
+        """
+        
+        self.zi = None
+        self.nIn = 0
+        self.nOut = 0
+        self.startTime = startTime
+    
+
+
+def traceEnvelope(time, trace, numPixels=2000):
+    """
+    Reduce a trace to the min and max of each pixel wide bin of samples
+    
+    Plotting the returned line, which goes from the min to the max of each bin in turn, draws the 
+    same pixels as plotting every sample but with at most 2 * numPixels points.
+    
+    Parameters
+    ----------
+    time : array
+        1D array of times of the samples
+    trace : array
+        1D array of the samples
+    numPixels : int
+        Number of bins, about the width in pixels of the plot
+    
+    Returns
+    -------
+    tuple
+        1D array of times, 1D array of values, each the min then max of every bin (or the inputs 
+        if there are fewer than 2 * numPixels samples)
+    """
+    
+    if len(trace) <= 2 * numPixels:
+        return time, trace
+    bin_size = math.ceil(len(trace) / numPixels)
+    mins = condenser.reduce_bins(trace, bin_size, 'min')
+    maxs = condenser.reduce_bins(trace, bin_size, 'max')
+    env_time = np.repeat(time[::bin_size], 2)
+    env = np.empty(2 * len(mins), dtype=trace.dtype)
+    env[0::2] = mins
+    env[1::2] = maxs
+    return env_time, env
+
+
+def rasterReduce(data, binSizes, reduce='peak'):
+    """
+    Reduce a 2D raster to pixel resolution by combining each block of binSizes values into one
+    
+    Parameters
+    ----------
+    data : array
+        2D array to reduce
+    binSizes : tuple
+        Number of rows and of columns in each block, the last block of each axis holds the remainder
+    reduce : str
+        'peak' for the value with the largest magnitude (keeping its sign) or 'rms' for the root mean square
+    
+    Returns
+    -------
+    array
+        2D array of shape (ceil(rows / binSizes[0]), ceil(columns / binSizes[1]))
+    """
+    
+    if reduce == 'rms':
+        squares = condenser.reduce_bins(np.square(data), binSizes[0], 'mean', axis=0)
+        return np.sqrt(condenser.reduce_bins(squares, binSizes[1], 'mean', axis=1))
+    if reduce != 'peak':
+        raise ValueError("reduce must be 'peak' or 'rms', not " + repr(reduce))
+    maxs = condenser.reduce_bins(condenser.reduce_bins(data, binSizes[0], 'max', axis=0), binSizes[1], 'max', axis=1)
+    mins = condenser.reduce_bins(condenser.reduce_bins(data, binSizes[0], 'min', axis=0), binSizes[1], 'min', axis=1)
+    return np.where(np.abs(maxs) >= np.abs(mins), maxs, mins)
+
+
+def sampleValues(data, numSamples=100000, seed=0):
+    """
+    Take a random sample (with replacement) of the values of an array
+    
+    Parameters
+    ----------
+    data : array
+        Array to sample
+    numSamples : int
+        Number of values to take
+    seed : int
+        Seed of the random generator, so the same data gives the same sample
+    
+    Returns
+    -------
+    array
+        1D array of sampled values
+    """
+    
+    rng = np.random.default_rng(seed)
+    inds = np.unravel_index(rng.integers(0, data.size, numSamples), data.shape)
+    return data[inds]
+
+
+def samplePercentile(data, q, numSamples=100000, seed=0):
+    """
+    Estimate a percentile of an array from a random sample of its values, for example for colour limits
+    
+    Parameters
+    ----------
+    data : array
+        Array to find the percentile of
+    q : float
+        Percentile, between 0 and 100
+    numSamples : int
+        Number of values to sample, the exact percentile is calculated for arrays not larger than this
+    seed : int
+        Seed of the random generator
+    
+    Returns
+    -------
+    float
+        Estimated percentile
+    """
+    
+    if data.size <= numSamples:
+        return np.percentile(data, q)
+    return np.percentile(sampleValues(data, numSamples, seed), q)
+
+
+def amplitudeSpectrum(signal, samplingFreq, channels, axis=0):
+    """
+    Calculate the amplitude spectrums of some channels with one FFT
+    
+    The spectrums are scaled the same as matplotlib's magnitude_spectrum: each channel is multiplied 
+    by a Hann window, and the magnitudes of its one sided rFFT are divided by the sum of the window.
+    
+    Parameters
+    ----------
+    signal : array
+        2D array of data
+    samplingFreq : float
+        Sampling frequency of the data in Hz
+    channels : int or list
+        Channel or channels to calculate the spectrums of
+    axis : int
+        Time axis of signal, 0 for time samples by channels or 1 for channels by time samples
+    
+    Returns
+    -------
+    tuple
+        1D array of frequencies in Hz, 2D array of amplitudes of shape (number of channels, number of frequencies)
+    """
+    
+    channels = np.atleast_1d(channels)
+    #channels by time samples, only copying the requested channels
+    traces = signal[:, channels].T if axis == 0 else signal[channels, :]
+    n = traces.shape[1]
+    window = np.hanning(n)
+    amps = np.abs(rfft(traces * window, axis=1)) / window.sum()
+    return rfftfreq(n, 1 / samplingFreq), amps
+
 
 def plotAmplitudeSpectrum(signal,downsampledSignal,channelNumber,signalFreq,downsampledFreq):
-    #signal = np.transpose(signal);
-    #downsampledSignal = np.transpose(downsampledSignal);
-    plt.magnitude_spectrum(signal[:,channelNumber],Fs=signalFreq)
-    plt.savefig('figures/ampSpectrum.png')
-    plt.xlabel("Frequency (Hz)");
-    plt.ylabel("Amplitude");
-    plt.close()
-    plt.magnitude_spectrum(downsampledSignal[channelNumber,:],Fs=downsampledFreq)
-    plt.savefig('figures/ampSpectrumDownsampled.png')
-    plt.xlabel("Frequency (Hz)");
-    plt.ylabel("Amplitude");
-    plt.close()
-
-    plt.magnitude_spectrum(signal[:,channelNumber],Fs=signalFreq,scale='dB')
-    plt.savefig('figures/logAmpSpectrum.png')
-    plt.xlabel("Frequency (Hz)");
-    plt.ylabel("Log(Amplitude)");
-    plt.close()
-
-    plt.magnitude_spectrum(downsampledSignal[channelNumber,:],Fs=downsampledFreq, scale='dB')
-    plt.savefig('figures/logAmpSpectrumDownsampled.png')
-    plt.xlabel("Frequency (Hz)");
-    plt.ylabel("Log(Amplitude)");
-    plt.close()
+    #one spectrum of each signal, plotted in both linear and dB scale
+    freqs, amps = amplitudeSpectrum(signal, signalFreq, channelNumber, axis=0)
+    freqs_d, amps_d = amplitudeSpectrum(downsampledSignal, downsampledFreq, channelNumber, axis=1)
+    plots = [(freqs, amps[0], 'figures/ampSpectrum.png', 'figures/logAmpSpectrum.png'),
+             (freqs_d, amps_d[0], 'figures/ampSpectrumDownsampled.png', 'figures/logAmpSpectrumDownsampled.png')]
+    
+    for (f, amp, linName, logName) in plots:
+        plt.plot(f, amp)
+        plt.xlabel("Frequency (Hz)");
+        plt.ylabel("Amplitude");
+        plt.savefig(linName)
+        plt.close()
+        
+        #same as magnitude_spectrum with scale='dB'
+        with np.errstate(divide='ignore'):
+            plt.plot(f, 20 * np.log10(amp))
+        plt.xlabel("Frequency (Hz)");
+        plt.ylabel("Log(Amplitude)");
+        plt.savefig(logName)
+        plt.close()
 
 
     
@@ -106,11 +788,12 @@ def plotLowpassDownsample(time,signal,downsampleTime,downsampledSignal,channelNu
 		first_d = min(min(temp));
 		temp = np.where(downsampleTime <= endTime);
 		last_d = max(max(temp));
-		plt.plot(time[first:last], signal[first:last,channelNumber], 'b-', label='signal')
-		plt.plot(downsampleTime[first_d:last_d], downsampledSignal[channelNumber,first_d:last_d], 'r-', label='downsampled signal')
+		plt.plot(*traceEnvelope(time[first:last], signal[first:last,channelNumber]), 'b-', label='signal')
+		plt.plot(*traceEnvelope(downsampleTime[first_d:last_d], downsampledSignal[channelNumber,first_d:last_d]), 'r-', label='downsampled signal')
 	else:
-		plt.plot(time, signal[:,channelNumber], 'b-', label='signal')
-		plt.plot(downsampleTime, downsampledSignal[channelNumber,:], 'r-', label='downsampled signal')
+		#plot at most two points per pixel
+		plt.plot(*traceEnvelope(time, signal[:,channelNumber]), 'b-', label='signal')
+		plt.plot(*traceEnvelope(downsampleTime, downsampledSignal[channelNumber,:]), 'r-', label='downsampled signal')
 	plt.xlabel("Time (s)");
 	plt.ylabel("Amplitude");
 	plt.legend();
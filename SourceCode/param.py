@@ -1,10 +1,18 @@
 # parameter file setup for save_data_prod.py: (any parameter files used should have .py extension and have the same parameter names)
-# line 6 is ch_group_size, the number of channels in each channel group that will be averaged together (int),
-# line 7 is min_data, the number of minutes of data to fetch (int), should be same interval as in the crontab file,  
-# line 8 is file_path, the path to directory to save hdf data product files (string)
-# line 9 is the downsampling factor to use in downsampling data to decimate original signal
+# line 11 is ch_group_size, the number of channels in each channel group that will be averaged together (int),
+# line 12 is min_data, the number of minutes of data to fetch (int), should be same interval as in the crontab file,  
+# line 13 is file_path, the path to directory to save hdf data product files (string)
+# line 14 is the downsampling factor to use in downsampling data to decimate original signal
+# line 15 is dtype, the floating point precision used to calculate and save the data products ('float64' or 'float32')
+# line 16 is num_peaks, the number of peak frequencies to save for each time window and channel group
+# line 17 is freq_bands, a list of (low, high) frequency bands in Hz to calculate and save, or None for all frequencies
+# line 18 is space_downsamp_factor, the downsampling factor over channels of the data downsampled over time and channels
 
 ch_group_size = 10
 min_data = 1
 file_path = "./files"
 downsamp_factor = 8
+dtype = 'float64'
+num_peaks = 1
+freq_bands = None
+space_downsamp_factor = 10
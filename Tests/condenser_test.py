@@ -3,6 +3,8 @@ import sys
 sys.path.insert(1, '../SourceCode')
 import condenser
 import numpy as np
+import os
+import tempfile
 
 class TestCond(unittest.TestCase):
     def test_calc_nyq_freq(self):
@@ -52,6 +54,30 @@ class TestCond(unittest.TestCase):
         self.assertEqual(ch_maxs[1], 3, "Max should be 3")
         self.assertEqual(ch_maxs[2], 4, "Max should be 4")
         self.assertEqual(ch_maxs[3], 5, "Max should be 5")    
+        
+        #one pass stats should match
+        means, stds, maxs = condenser.time_stats(data, block_size=4)
+        self.assertTrue(np.allclose(means, condenser.mean_time(data)), "One pass means should match")
+        self.assertTrue(np.allclose(stds, condenser.std_dev_time(data)), "One pass std devs should match")
+        self.assertTrue(np.array_equal(maxs, ch_maxs), "One pass maximums should match")
+    
+    def test_time_stats_merge(self):
+        rng = np.random.default_rng(3)
+        data = rng.standard_normal((1000, 6)) * 5 + 100
+        
+        #accumulate two chunks separately then merge
+        first = condenser.TimeStats(6, block_size=64)
+        first.update(data[:300])
+        second = condenser.TimeStats(6, block_size=64)
+        second.update(data[300:])
+        first.merge(second)
+        
+        self.assertEqual(first.n_samples, 1000, "Should count every sample")
+        self.assertTrue(np.allclose(first.mean, np.mean(data, axis=0)), "Merged means should match")
+        self.assertTrue(np.allclose(first.std, np.std(data, axis=0)), "Merged std devs should match")
+        self.assertTrue(np.allclose(first.rms, np.sqrt(np.mean(data ** 2, axis=0))), "Merged rms should match")
+        self.assertTrue(np.array_equal(first.min, np.min(data, axis=0)), "Merged minimums should match")
+        self.assertTrue(np.array_equal(first.max, np.max(data, axis=0)), "Merged maximums should match")
     
     def test_condmatrix(self):
         #calculate fft for test
@@ -92,6 +118,204 @@ class TestCond(unittest.TestCase):
         #check peak_frequency - change func? returns beg of freq bin
         self.assertEqual(peak_freq, 5.0, "Peak freq should be 5.0")
         
+        #loop method should give the same results
+        loop_results = condenser.condmatrix(data, 5, 2, 4, 2, 7, n_freq, 10, method='loop')
+        for arr, loop_arr in zip((spect, std_devs, means, max_vals, peak_freq), loop_results):
+            self.assertTrue(np.allclose(arr, loop_arr), "Vectorized and loop methods should match")
+    
+    def test_condmatrix_methods(self):
+        #random data with a remainder channel group and a noisy outlier channel
+        rng = np.random.default_rng(0)
+        data = rng.standard_normal((1000, 47))
+        data[:, 3] *= 50
+        
+        n_tw = condenser.calc_num_time_win(len(data), 100)
+        n_groups = condenser.calc_num_ch_groups(47, 10)
+        n_freq = condenser.calc_num_freq(len(data), n_tw)
+        
+        vec_results = condenser.condmatrix(data, n_tw, 100, n_groups, 10, 46, n_freq, 250)
+        loop_results = condenser.condmatrix(data, n_tw, 100, n_groups, 10, 46, n_freq, 250, method='loop')
+        
+        for arr, loop_arr in zip(vec_results, loop_results):
+            self.assertTrue(np.allclose(arr, loop_arr), "Vectorized and loop methods should match")
+        
+        #tiles run on a thread pool should merge to the same results
+        par_results = condenser.condmatrix(data, n_tw, 100, n_groups, 10, 46, n_freq, 250, workers=4)
+        for arr, par_arr in zip(vec_results, par_results):
+            self.assertTrue(np.allclose(arr, par_arr), "Parallel and vectorized methods should match")
+    
+    def test_streaming_condenser(self):
+        rng = np.random.default_rng(1)
+        data = rng.standard_normal((1050, 47))
+        
+        n_freq = condenser.calc_num_freq(1000, 10)
+        n_groups = condenser.calc_num_ch_groups(47, 10)
+        spect, std_devs, means, max_vals, peak_freq = condenser.condmatrix(data, 10, 100, n_groups, 10, 46, n_freq, 250)
+        
+        #push blocks that do not line up with the time windows
+        stream = condenser.StreamingCondenser(100, n_groups, 10, 46, n_freq, 250)
+        spect_rows = []
+        std_rows = []
+        for beg in range(0, len(data), 70):
+            s_rows, d_rows = stream.push(data[beg:beg + 70])
+            spect_rows.append(s_rows)
+            std_rows.append(d_rows)
+        
+        self.assertEqual(stream.n_windows, 10, "Should complete 10 time windows")
+        self.assertTrue(np.allclose(np.concatenate(spect_rows), spect), "Streamed spectral tensor should match")
+        self.assertTrue(np.allclose(np.concatenate(std_rows), std_devs), "Streamed std deviations should match")
+        
+        s_means, s_maxs, s_peak = stream.result()
+        self.assertTrue(np.allclose(s_means, means), "Streamed means should match")
+        self.assertTrue(np.allclose(s_maxs, max_vals), "Streamed maximums should match")
+        self.assertEqual(s_peak, peak_freq, "Streamed peak frequency should match")
+    
+    def test_condmatrix_float32(self):
+        rng = np.random.default_rng(2)
+        data = rng.standard_normal((1000, 47)).astype(np.float32)
+        
+        results_64 = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250)
+        results_32 = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250, dtype=np.float32)
+        
+        for arr_64, arr_32 in zip(results_64[:4], results_32[:4]):
+            self.assertEqual(arr_32.dtype, np.float32, "Results should be float32")
+            self.assertTrue(np.allclose(arr_32, arr_64, rtol=1e-4), "float32 results should be close to float64")
+    
+    def test_condmatrix_out_of_core(self):
+        rng = np.random.default_rng(4)
+        data = rng.standard_normal((1050, 47))
+        results = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            #memory mapped input and on disk outputs
+            data_path = os.path.join(tmp_dir, 'data.dat')
+            mapped = np.memmap(data_path, dtype=data.dtype, mode='w+', shape=data.shape)
+            mapped[:] = data
+            mapped.flush()
+            mapped = np.memmap(data_path, dtype=data.dtype, mode='r', shape=data.shape)
+            spect_out = np.lib.format.open_memmap(os.path.join(tmp_dir, 'spect.npy'), mode='w+', dtype=np.float64, shape=(10, 5, 51))
+            
+            for prefetch in (True, False):
+                ooc_results = condenser.condmatrix_out_of_core(mapped, 10, 100, 5, 10, 46, 51, 250, spect_out=spect_out, prefetch=prefetch)
+                self.assertTrue(ooc_results[0] is spect_out, "Should write to the given output")
+                for arr, ooc_arr in zip(results, ooc_results):
+                    self.assertTrue(np.allclose(arr, ooc_arr), "Out of core results should match")
+            
+            #prefetched windows are copied out of the map so the background thread reads the pages
+            buf = np.empty((100, 47))
+            rows = condenser._read_rows(mapped, 100, 200, 46, out=buf)
+            self.assertTrue(np.shares_memory(rows, buf) and not np.shares_memory(rows, mapped), "Should copy into the buffer")
+            self.assertTrue(np.array_equal(rows, data[100:200]))
+            del mapped, spect_out, rows
+    
+    def test_reduce_bins(self):
+        arr = np.arange(7.0)
+        self.assertTrue(np.array_equal(condenser.reduce_bins(arr, 3), [1, 4, 6]), "Remainder bin should average its own values")
+        self.assertTrue(np.array_equal(condenser.reduce_bins(arr, 3, 'max'), [2, 5, 6]), "Should take max of each bin")
+        self.assertTrue(np.array_equal(condenser.reduce_bins(arr, 3, 'min'), [0, 3, 6]), "Should take min of each bin")
+        self.assertTrue(np.array_equal(condenser.reduce_bins(arr.astype(np.uint8), 3, 'min'), [0, 3, 6]), "Should take min of unsigned values")
+        self.assertTrue(np.array_equal(condenser.reduce_bins(arr, 3, 'sum'), [3, 12, 6]), "Should sum each bin")
+    
+    def test_condmatrix_reducers(self):
+        rng = np.random.default_rng(5)
+        data = rng.standard_normal((1000, 47))
+        spect, std_devs, means, max_vals, peak_freq = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250)
+        
+        #average every 4 windows (remainder of 2) and every 3 freq bins, compared to the nan padding it replaces
+        padded = np.pad(spect, ((0, 2), (0, 0), (0, 0)), mode='constant', constant_values=np.nan)
+        expected = np.nanmean(padded.reshape(-1, 4, 5, 51), axis=1)
+        expected = np.mean(expected.reshape(3, 5, 17, 3), axis=-1)
+        
+        for method in ('vectorized', 'loop'):
+            results = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250, method=method, freq_bin=3, time_bin=4)
+            self.assertTrue(np.allclose(results[0], expected), "Reduced spectral tensor should match")
+            for arr, red_arr in zip((std_devs, means, max_vals, peak_freq), results[1:]):
+                self.assertTrue(np.allclose(arr, red_arr), "Statistics should not change")
+        
+        max_spect = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250, time_bin=5, time_reduce='max')[0]
+        self.assertTrue(np.allclose(max_spect, np.max(spect.reshape(2, 5, 5, 51), axis=1)), "Should take max of windows")
+    
+    def test_condmatrix_peaks(self):
+        #20 Hz signal on the first group, 50 Hz on the second
+        t = np.arange(1000) / 500
+        data = np.zeros((1000, 20))
+        data[:, :10] = np.sin(2 * np.pi * 20 * t)[:, np.newaxis]
+        data[:, 10:] = 0.5 * np.sin(2 * np.pi * 50 * t)[:, np.newaxis]
+        
+        for method in ('vectorized', 'loop'):
+            results = condenser.condmatrix(data, 10, 100, 2, 10, 19, 51, 250, method=method, return_peaks=True, top_k=2)
+            peak_inds, peak_amps = results[5], results[6]
+            
+            self.assertEqual(peak_inds.shape, (10, 2, 2), "Should have top 2 peaks for each window and group")
+            #bins are 5 Hz wide in a 100 sample window
+            self.assertTrue(np.all(peak_inds[:, 0, 0] == 4), "Group 0 peak should be the 20 Hz bin")
+            self.assertTrue(np.all(peak_inds[:, 1, 0] == 10), "Group 1 peak should be the 50 Hz bin")
+            self.assertTrue(np.all(peak_amps[:, :, 0] >= peak_amps[:, :, 1]), "Peaks should be ordered highest first")
+            self.assertTrue(np.allclose(peak_amps[:, 0, 0], 50), "Peak amplitude should be the group mean magnitude")
+        
+        #same peaks when the spectral tensor is reduced
+        reduced = condenser.condmatrix(data, 10, 100, 2, 10, 19, 51, 250, return_peaks=True, time_bin=3, freq_bin=2)
+        self.assertTrue(np.array_equal(reduced[5][:, :, 0], peak_inds[:, :, 0]), "Peaks should not depend on reducers")
+    
+    def test_band_bins(self):
+        #bins are 5 Hz wide in a 100 sample window at 500 Hz
+        bins = condenser.band_bins([(10, 20), (100, 104)], 100, 250)
+        self.assertTrue(np.array_equal(bins, [2, 3, 4, 20]), "Should select bins inside the bands")
+        
+        #bands above the nyquist frequency or between two bins select nothing
+        with self.assertRaises(ValueError):
+            condenser.band_bins([(300, 400)], 100, 250)
+        with self.assertRaises(ValueError):
+            condenser.condmatrix(np.zeros((1000, 47)), 10, 100, 5, 10, 46, 51, 250, freq_bands=[(11, 14)])
+    
+    def test_condmatrix_bands(self):
+        rng = np.random.default_rng(6)
+        data = rng.standard_normal((1000, 47))
+        data[:, 5] *= 20
+        
+        #few bins use a direct DFT, many bins pick from the full rFFT
+        for bands in ([(10, 20)], [(0, 150), (200, 250)]):
+            bins = condenser.band_bins(bands, 100, 250)
+            loop_results = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250, method='loop', freq_bands=bands, return_peaks=True)
+            for workers in (None, 3):
+                results = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250, freq_bands=bands, return_peaks=True, workers=workers)
+                self.assertEqual(results[0].shape, (10, 5, len(bins)), "Should only hold the selected bins")
+                for arr, loop_arr in zip(results, loop_results):
+                    self.assertTrue(np.allclose(arr, loop_arr), "Band results should match the loop method")
+            self.assertTrue(np.all(np.isin(results[5], bins)), "Peaks should be selected bins")
+            self.assertTrue(results[4] in bins * 5.0, "Peak frequency should be a selected bin frequency")
+    
+    def test_condenser_plan(self):
+        rng = np.random.default_rng(7)
+        plan = condenser.CondenserPlan(1000, 47, 100, 10, 500)
+        
+        self.assertEqual(plan.num_time_windows, 10, "Should be 10 time windows")
+        self.assertEqual(plan.num_sensor_groups, 5, "Should be 5 channel groups")
+        self.assertEqual(plan.num_freq, 51, "Should be 51 frequencies")
+        
+        for i in range(2):
+            data = rng.standard_normal((1000, 47))
+            results = plan.execute(data)
+            expected = condenser.condmatrix(data, 10, 100, 5, 10, 46, 51, 250)
+            for arr, exp_arr in zip(results, expected):
+                self.assertTrue(np.allclose(arr, exp_arr), "Plan results should match condmatrix")
+            self.assertTrue(results[0] is plan.spect, "Should reuse the plan's spectral tensor")
+        
+        #results written to given arrays, also when split over threads
+        out = plan.empty_outputs()
+        threaded = condenser.CondenserPlan(1000, 47, 100, 10, 500, workers=3)
+        results = threaded.execute(data, out=out)
+        self.assertTrue(results[2] is out[2], "Should write to the given means")
+        for arr, exp_arr in zip(results, expected):
+            self.assertTrue(np.allclose(arr, exp_arr), "Threaded plan results should match condmatrix")
+        
+        with self.assertRaises(ValueError):
+            plan.execute(data[:500])
+    
+    def test_group_bounds(self):
+        bounds = condenser.group_bounds(3, 10, 24)
+        self.assertTrue(np.array_equal(bounds, [[0, 10], [10, 20], [20, 25]]), "Last group should hold the remainder channels")
+        
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
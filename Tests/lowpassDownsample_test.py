@@ -0,0 +1,189 @@
+import unittest
+import sys
+sys.path.insert(1, '../SourceCode')
+import lowpassDownsample
+import numpy as np
+import scipy.signal
+import h5py
+import os
+import tempfile
+from matplotlib import mlab
+
+class TestLowpassDownsample(unittest.TestCase):
+    def test_decimation_stages(self):
+        self.assertEqual(lowpassDownsample.decimationStages(8), [4, 2], "Should pack 2*2*2 into stages of at most 5")
+        self.assertEqual(lowpassDownsample.decimationStages(100), [5, 5, 4], "Should pack 2*2*5*5 into stages of at most 5")
+        self.assertEqual(lowpassDownsample.decimationStages(14), [7, 2], "Primes above maxStageFactor should be their own stage")
+        self.assertEqual(lowpassDownsample.decimationStages(8, maxStageFactor=8), [8], "Should be one stage")
+        self.assertEqual(lowpassDownsample.decimationStages(1), [], "Should have no stages")
+
+    def test_downsampled_length(self):
+        rng = np.random.default_rng(0)
+        for n in (200, 1000, 1001, 1003):
+            data = rng.standard_normal((n, 3))
+            for q in (1, 4, 8, 10, 14):
+                cascade = lowpassDownsample.cascadeDownsample(data, q, 500)
+                self.assertEqual(cascade.shape, (lowpassDownsample.downsampledLength(n, q), 3), "Should match the cascade output")
+        for n in (1, 99, 100, 101, 1003):
+            for q in (2, 4, 10):
+                polyphase = lowpassDownsample.polyphaseDownsample(np.ones((n, 3)), q)
+                self.assertEqual(polyphase.shape, (-(-n // q), 3), "Should be ceil(n / q) samples")
+        
+        #rounding up at each stage is the same as rounding up once
+        self.assertEqual(lowpassDownsample.downsampledLength(1001, 8), 126, "Should be ceil(n / q) samples")
+        self.assertEqual(lowpassDownsample.downsampledLength(1001, 8, maxStageFactor=8), 126, "Should be ceil(n / q) samples")
+        self.assertEqual(lowpassDownsample.downsampledLength(1003, 12), 84, "Should be ceil(n / q) samples")
+
+    def test_polyphase_downsample(self):
+        #a tone well below the new nyquist frequency passes, one above it is removed
+        fs = 1000
+        t = np.arange(4000) / fs
+        low = np.sin(2 * np.pi * 10 * t)
+        high = np.sin(2 * np.pi * 200 * t)
+        downsampled = lowpassDownsample.polyphaseDownsample(np.stack([low, low + high], axis=1), 5)
+        self.assertEqual(downsampled.shape, (800, 2), "Should keep one sample in 5")
+        self.assertTrue(np.allclose(downsampled[100:-100, 0], low[::5][100:-100], atol=1e-2), "Pass band should be unchanged and not delayed")
+        self.assertTrue(np.allclose(downsampled[100:-100, 1], downsampled[100:-100, 0], atol=1e-2), "Stop band should be removed")
+
+        #same along the channel axis
+        along_channels = lowpassDownsample.polyphaseDownsample(np.stack([low, low + high], axis=0), 5, axis=1)
+        self.assertTrue(np.allclose(along_channels, downsampled.T), "Should not depend on the axis")
+
+    def test_parallel_downsample(self):
+        rng = np.random.default_rng(1)
+        data = rng.standard_normal((2003, 37))
+        means = data.mean(axis=0)
+        serial = lowpassDownsample.cascadeDownsample(data - means, 10, 500)
+        for workers in (None, 1, 3):
+            for channelBlock in (1, 8, 256):
+                parallel = lowpassDownsample.parallelDownsample(data, 10, 500, workers=workers, channelBlock=channelBlock, means=means)
+                self.assertTrue(np.array_equal(parallel, serial), "Should be bitwise equal to one serial call")
+
+        #written straight into a transposed view
+        out = np.zeros((37, lowpassDownsample.downsampledLength(2003, 10)))
+        lowpassDownsample.parallelDownsample(data, 10, 500, workers=2, channelBlock=8, out=out.T, means=means)
+        self.assertTrue(np.array_equal(out.T, serial), "Should fill the given out array")
+        with self.assertRaises(ValueError):
+            lowpassDownsample.parallelDownsample(data, 10, 500, out=out)
+
+        #one stage keeps the same numbers as cascadeDownsample of one stage
+        one_stage = lowpassDownsample.parallelDownsample(data, 8, 500, workers=2, channelBlock=8, maxStageFactor=8)
+        self.assertTrue(np.array_equal(one_stage, lowpassDownsample.cascadeDownsample(data, 8, 500, maxStageFactor=8)), "Should pass maxStageFactor on")
+
+    def test_space_time_downsample(self):
+        rng = np.random.default_rng(3)
+        data = rng.standard_normal((2000, 45))
+        time_ds, space_time_ds = lowpassDownsample.spaceTimeDownsample(data, 8, 10, 500, workers=2, channelBlock=16, maxStageFactor=8)
+        self.assertTrue(np.array_equal(time_ds, scipy.signal.decimate(data, 8, axis=0)), "One stage should be the same as decimate")
+        self.assertEqual(space_time_ds.shape, (250, 5), "Should downsample the channels by 10")
+        self.assertTrue(np.allclose(space_time_ds, lowpassDownsample.polyphaseDownsample(time_ds, 10, axis=1)), "Should downsample channels after time")
+        
+        #spaceDownsampleFactor of 1 only downsamples time
+        time_ds, space_time_ds = lowpassDownsample.spaceTimeDownsample(data, 8, 1, 500)
+        self.assertTrue(space_time_ds is time_ds, "Should not downsample the channels")
+        self.assertTrue(np.array_equal(time_ds, lowpassDownsample.cascadeDownsample(data, 8, 500)), "Should use stages of at most 5 by default")
+
+    def test_streaming_decimator(self):
+        rng = np.random.default_rng(2)
+        data = rng.standard_normal((1000, 5)) + 3
+        whole = lowpassDownsample.StreamingDecimator(4, 500, startTime=2.0)
+        whole_time, whole_ds = whole.process(data)
+        self.assertEqual(whole_ds.shape, (250, 5), "Should keep one sample in 4")
+        self.assertTrue(np.allclose(whole_time, 2.0 + np.arange(250) / 125), "Times should count from startTime at the new rate")
+
+        #any split into blocks, including empty ones and ones shorter than the factor, gives the same stream
+        for splits in ([500], [1, 2, 3, 997], [3, 3, 3, 3, 988], [0, 999], list(range(7, 1000, 7)), list(rng.choice(999, 40, replace=False) + 1)):
+            decimator = lowpassDownsample.StreamingDecimator(4, 500, startTime=2.0)
+            bounds = [0] + sorted(splits) + [1000]
+            results = [decimator.process(data[beg:end]) for beg, end in zip(bounds[:-1], bounds[1:])]
+            times = np.concatenate([r[0] for r in results])
+            blocks = np.concatenate([r[1] for r in results])
+            self.assertTrue(np.allclose(blocks, whole_ds, rtol=0, atol=1e-12), "Block split " + str(splits[:5]) + " should not change the output")
+            self.assertTrue(np.array_equal(times, whole_time), "Block split should not change the times")
+            self.assertEqual((decimator.nIn, decimator.nOut), (1000, 250), "Should count the samples in and out")
+
+        #the steady state start means a constant stream has no transient, only the pass band ripple of the DC gain
+        constant = lowpassDownsample.StreamingDecimator(4, 500).process(np.full((100, 2), 3.0))[1]
+        self.assertTrue(np.allclose(constant, constant[-1], rtol=0, atol=1e-9), "Should start at steady state")
+        self.assertTrue(np.allclose(constant, 3.0, rtol=1e-2), "Should pass DC")
+
+        #reset starts a new stream
+        whole.reset(startTime=2.0)
+        again_time, again_ds = whole.process(data)
+        self.assertTrue(np.array_equal(again_ds, whole_ds) and np.array_equal(again_time, whole_time), "Reset should start a new stream")
+
+    def test_amplitude_spectrum(self):
+        rng = np.random.default_rng(5)
+        for n in (1000, 1001):
+            t = np.arange(n) / 500
+            data = rng.standard_normal((n, 6)) + 4 * np.sin(2 * np.pi * 60 * t)[:, np.newaxis]
+            channels = [0, 2, 5]
+            freqs, amps = lowpassDownsample.amplitudeSpectrum(data, 500, channels)
+            self.assertEqual(amps.shape, (3, n // 2 + 1), "Should be one spectrum per channel")
+            
+            #same scaling as matplotlib's magnitude_spectrum with a hann window
+            for i, ch in enumerate(channels):
+                mlab_amps, mlab_freqs = mlab.magnitude_spectrum(data[:, ch], Fs=500, window=mlab.window_hanning)
+                self.assertTrue(np.allclose(freqs, mlab_freqs), "Frequencies should match magnitude_spectrum")
+                self.assertTrue(np.allclose(amps[i], mlab_amps), "Amplitudes should match magnitude_spectrum")
+            
+            #one batched call is the same as a call per channel
+            for i, ch in enumerate(channels):
+                single_freqs, single = lowpassDownsample.amplitudeSpectrum(data, 500, ch)
+                self.assertTrue(np.array_equal(single_freqs, freqs), "Frequencies should not depend on the channels")
+                self.assertTrue(np.allclose(single[0], amps[i], rtol=0, atol=1e-12), "Batched call should match one call per channel")
+            
+            #channels by time samples gives the same spectrums
+            transposed_freqs, transposed = lowpassDownsample.amplitudeSpectrum(np.ascontiguousarray(data.T), 500, channels, axis=1)
+            self.assertTrue(np.array_equal(transposed_freqs, freqs), "Frequencies should not depend on the axis")
+            self.assertTrue(np.allclose(transposed, amps, rtol=0, atol=1e-12), "Should not depend on the axis")
+
+    def test_plot_reducers(self):
+        #min then max of each bin, unsigned data is not negated
+        trace = np.array([5, 1, 9, 3, 7, 2, 8, 0, 6, 4] * 100, dtype=np.uint16)
+        env_time, env = lowpassDownsample.traceEnvelope(np.arange(1000) / 10, trace, numPixels=200)
+        self.assertEqual(env.dtype, np.uint16, "Should keep the dtype")
+        self.assertTrue(np.array_equal(env[:4], [1, 9, 0, 8]), "Should be the min and max of each bin")
+        self.assertTrue(np.array_equal(env_time[:4], [0, 0, 0.5, 0.5]), "Should be the time of the start of each bin")
+        
+        #value with the largest magnitude of each block, keeping its sign
+        data = np.array([[1, -4, 2, 0], [3, 0, -1, 5], [0, 2, 0, 0]])
+        self.assertTrue(np.array_equal(lowpassDownsample.rasterReduce(data, (2, 2)), [[-4, 5], [2, 0]]), "Should keep the peak of each block")
+        self.assertTrue(np.array_equal(lowpassDownsample.rasterReduce(data.astype(np.uint8) + 4, (2, 2)), [[7, 9], [6, 4]]), "Should take the max of unsigned data")
+        self.assertTrue(np.allclose(lowpassDownsample.rasterReduce(data, (3, 4), 'rms'), [[np.sqrt(60 / 12)]]), "Should be the rms of the block")
+
+    def test_lowpass_downsample_file(self):
+        rng = np.random.default_rng(4)
+        data = rng.standard_normal((1000, 6))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'data.h5')
+            with h5py.File(file_name, 'w') as f:
+                f.attrs['dt_computer'] = 0.002
+                f.attrs['nt'] = 1000
+                f.create_group('data_product').create_dataset('data', data=data, chunks=(96, 6))
+            
+            #blocks are whole chunks and cover the data once
+            blocks = list(lowpassDownsample.iterFileData(file_name, blockSamples=100))
+            self.assertEqual([b.shape[0] for b in blocks], [192] * 5 + [40], "Blocks should be rounded up to whole chunks")
+            self.assertTrue(np.array_equal(np.concatenate(blocks), data), "Blocks should hold all the data")
+            
+            #same stream as one call to the decimator
+            expected_time, expected = lowpassDownsample.StreamingDecimator(4, 500).process(data)
+            downsampled_time, downsampled, downsampled_freq = lowpassDownsample.lowpassDownsampleFile(file_name, 4, blockSamples=100)
+            self.assertEqual(downsampled_freq, 125, "Should be 125 Hz")
+            self.assertTrue(np.allclose(downsampled, expected, rtol=0, atol=1e-12), "Should match one call to the decimator")
+            self.assertTrue(np.array_equal(downsampled_time, expected_time), "Should match the decimator times")
+            
+            #written to a file, running again replaces the dataset instead of appending to it
+            out_file = os.path.join(tmp_dir, 'out.h5')
+            for run in range(2):
+                _, returned, _ = lowpassDownsample.lowpassDownsampleFile(file_name, 4, blockSamples=100, outFile=out_file)
+                self.assertTrue(returned is None, "Should not return the data written to the file")
+                with h5py.File(out_file, 'r') as f:
+                    dset = f['lowpass_and_downsample']
+                    self.assertEqual(dset.shape, (250, 6), "Should hold one run of downsampled data")
+                    self.assertTrue(np.allclose(dset[()], expected, rtol=0, atol=1e-12), "Should write the downsampled data")
+                    self.assertEqual(dset.attrs['downsampled_sampling_freq'], 125, "Should save the sampling frequency")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sys
+sys.path.insert(1, '../SourceCode')
+from Silixa.tdms_collection import TdmsCollection, file_name_time
+import condenser
+from tdms_reader_test import write_tdms
+import numpy as np
+import datetime
+import os
+import tempfile
+
+class TestTdmsCollection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        #three one minute files written out of order, of different lengths
+        self.names = ['PSUDAS_UTC_20190426_205543.415.tdms', 'PSUDAS_UTC_20190426_205443.415.tdms', 'PSUDAS_UTC_20190426_205643.415.tdms']
+        self.datas = [(rng.standard_normal((n, 12)) * 100).astype(np.int16) for n in (300, 250, 410)]
+        for name, data in zip(self.names, self.datas):
+            write_tdms(os.path.join(self.tmp.name, name), data, [], 64, segment_lengths=[100, data.shape[0] - 100])
+        #data in time order
+        self.data = np.concatenate([self.datas[1], self.datas[0], self.datas[2]])
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_file_name_time(self):
+        self.assertEqual(file_name_time('/data/PSUDAS_UTC_20190426_205443.415.tdms'), datetime.datetime(2019, 4, 26, 20, 54, 43, 415000))
+        self.assertIsNone(file_name_time('recording.tdms'))
+    
+    def test_order_and_length(self):
+        with TdmsCollection(self.tmp.name) as coll:
+            self.assertEqual([os.path.basename(fp) for fp in coll.file_paths], sorted(self.names), "Should order files by time")
+            self.assertEqual(coll.channel_length, 960)
+            self.assertEqual(coll.n_channels, 12)
+        
+        #header time for files without one in their name
+        fp = os.path.join(self.tmp.name, 'early.tdms')
+        write_tdms(fp, self.datas[0], [('GPSTimeStamp', datetime.datetime(2019, 4, 26, 20, 0, 0))], 64)
+        with TdmsCollection(os.path.join(self.tmp.name, '*.tdms')) as coll:
+            self.assertEqual(coll.file_paths[0], fp)
+    
+    def test_get_data_across_files(self):
+        with TdmsCollection(self.tmp.name, max_open=2) as coll:
+            np.testing.assert_array_equal(coll.get_data(), self.data)
+            np.testing.assert_array_equal(coll.get_data(2, 9, 240, 700), self.data[240:701, 2:10])
+            np.testing.assert_array_equal(coll.get_data(0, None, 5, None, ch_step=5, s_step=270), self.data[5::270, ::5])
+            np.testing.assert_array_equal(coll.get_data(0, 0, 100, 900, channels=[11, 3]), self.data[100:901, [11, 3]])
+            self.assertEqual(coll.get_data(0, 3, 960, None).shape, (0, 4))
+            self.assertLessEqual(len(coll._readers), 2, "Should keep at most max_open files open")
+            
+            blocks = list(coll.iter_blocks(200, overlap=10))
+            np.testing.assert_array_equal(blocks[1], self.data[190:400])
+            np.testing.assert_array_equal(np.concatenate([b[10 if k else 0:] for k, b in enumerate(blocks)]), self.data)
+    
+    def test_condense_collection(self):
+        #the collection can be condensed like a single file
+        with TdmsCollection(self.tmp.name) as coll:
+            results = condenser.condmatrix_out_of_core(coll, 4, 200, 3, 4, 11, 101, 250)
+        expected = condenser.condmatrix(self.data, 4, 200, 3, 4, 11, 101, 250)
+        for result, exp in zip(results, expected):
+            np.testing.assert_allclose(result, exp)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,11 @@ from Silixa import tdms_func
 import numpy as np
 from datetime import datetime, timedelta
 import pytz
+import condenser
+from Silixa import tdms_params as tp
+from tdms_reader_test import write_tdms
+import os
+import tempfile
 
 class TestCond(unittest.TestCase):
     
@@ -54,6 +59,36 @@ class TestCond(unittest.TestCase):
         self.assertEqual(freq_ind[1], (250/167), "Should be about 1.497 Hz")
         #last value is nyquist freq
         self.assertEqual(freq_ind[2], 250, "Should be 250 Hz")
+    def test_combine_data_products(self):
+        params = {'first_channel': 0, 'last_channel': 49, 'first_time_sample': 0, 'last_time_sample': 5499,
+                  'time_window': 1000, 'ch_group_size': 10, 'bin_size': 3, 'dtype': 'float64'}
+        saved = dict((name, getattr(tp, name)) for name in params)
+        tmp = tempfile.TemporaryDirectory()
+        try:
+            for name in params:
+                setattr(tp, name, params[name])
+            #two files of 5.5 time windows, in two segments each
+            datas = [(np.random.default_rng(k).standard_normal((5500, 50)) * 100).astype(np.int16) for k in range(2)]
+            file_paths = [os.path.join(tmp.name, str(k) + '.tdms') for k in range(2)]
+            for fp, data in zip(file_paths, datas):
+                write_tdms(fp, data, [], 256, segment_lengths=[2000, 3500])
+            
+            results = tdms_func.combine_data_products(2, 5, 5, 167, file_paths, 250)
+            
+            #same as condensing each whole file at once
+            for k, data in enumerate(datas):
+                spect, std_devs, means, max_vals, peak_freq = condenser.condmatrix(data, 5, 1000, 5, 10, 49, condenser.calc_num_freq(5500, 5), 250, freq_bin=3)
+                np.testing.assert_allclose(results[0][k * 5:(k + 1) * 5], spect)
+                np.testing.assert_allclose(results[1][k], std_devs)
+                np.testing.assert_allclose(results[2][k], means)
+                np.testing.assert_allclose(results[3][k], max_vals)
+                self.assertEqual(results[4][k], peak_freq)
+                for stat, expected in zip(results[5:], condenser.time_stats(data)):
+                    np.testing.assert_allclose(stat[k], expected)
+        finally:
+            for name in saved:
+                setattr(tp, name, saved[name])
+            tmp.cleanup()
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
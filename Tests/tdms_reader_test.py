@@ -0,0 +1,205 @@
+import unittest
+import sys
+sys.path.insert(1, '../SourceCode')
+from Silixa.tdms_reader import TdmsReader
+import numpy as np
+import datetime
+import os
+import struct
+import tempfile
+
+
+def tdms_string(s):
+    b = s.encode()
+    return struct.pack('<I', len(b)) + b
+
+
+def write_tdms(filename, data, props, chunk_size, interleaved=False, segment_lengths=None):
+    """
+    Write a TDMS file laid out the way TdmsReader expects (one group, one data type for every channel)
+    
+    data is time samples by channels of int16 or float32, props is a list of (name, value) with 
+    str, float, int or datetime values and segment_lengths is the number of time samples in each 
+    segment (one segment of all the data if None). Only the first segment has metadata.
+    """
+    n_samples, n_channels = data.shape
+    type_code = {np.dtype('int16'): 0x02, np.dtype('float32'): 0x09}[data.dtype]
+    if segment_lengths is None:
+        segment_lengths = [n_samples]
+    
+    meta = struct.pack('<i', n_channels + 2)
+    #file object and its properties
+    meta += tdms_string('/') + struct.pack('<Ii', 0xFFFFFFFF, len(props))
+    for name, value in props:
+        meta += tdms_string(name)
+        if isinstance(value, str):
+            meta += struct.pack('<i', 0x20) + tdms_string(value)
+        elif isinstance(value, datetime.datetime):
+            seconds = (value - datetime.datetime(1904, 1, 1)).total_seconds()
+            meta += struct.pack('<iQq', 0x44, 0, int(seconds))
+        elif isinstance(value, float):
+            meta += struct.pack('<id', 0x0a, value)
+        else:
+            meta += struct.pack('<ii', 0x03, value)
+    #group object without properties
+    meta += tdms_string("/'Measurement'") + struct.pack('<Ii', 0xFFFFFFFF, 0)
+    #channel objects
+    for ch in range(n_channels):
+        meta += tdms_string("/'Measurement'/'" + str(ch) + "'") + struct.pack('<IiIQi', 20, type_code, 1, chunk_size, 0)
+    
+    toc = 0x2 | 0x4 | 0x8 | (0x20 if interleaved else 0)
+    with open(filename, 'wb') as f:
+        beg = 0
+        for i, seg_len in enumerate(segment_lengths):
+            seg = data[beg:beg + seg_len]
+            beg += seg_len
+            if interleaved:
+                raw = seg.tobytes()
+            else:
+                #whole chunks of chunk_size samples of each channel in turn, then the remaining samples of each channel
+                n_full = seg_len // chunk_size
+                raw = b''.join(seg[c * chunk_size:(c + 1) * chunk_size].T.tobytes() for c in range(n_full))
+                raw += seg[n_full * chunk_size:].T.tobytes()
+            seg_meta = meta if i == 0 else b''
+            seg_toc = toc if i == 0 else toc & ~0x6
+            f.write(struct.pack('<4siiQQ', b'TDSm', seg_toc, 4713, len(seg_meta) + len(raw), len(seg_meta)))
+            f.write(seg_meta)
+            f.write(raw)
+
+
+class TestTdmsReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.props = [('SamplingFrequency[Hz]', 1000.0), ('SpatialResolution[m]', 0.25), ('Fibre Length Multiplier', 1.0),
+                      ('Zero Offset (m)', 0.0), ('GPSTimeStamp', datetime.datetime(2021, 9, 9, 18, 16, 15)),
+                      ('Description', 'synthetic file'), ('Repeats', 3)]
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write(self, data, **kwargs):
+        fp = os.path.join(self.tmp.name, 'test_' + str(len(os.listdir(self.tmp.name))) + '.tdms')
+        write_tdms(fp, data, self.props, **kwargs)
+        return fp
+    
+    def test_properties(self):
+        data = np.arange(40 * 6, dtype=np.int16).reshape(40, 6)
+        with TdmsReader(self.write(data, chunk_size=16)) as tdms:
+            props = tdms.get_properties()
+            self.assertEqual(tdms.fileinfo['n_channels'], 6, "Should be 6 channels")
+            self.assertEqual(tdms._chunk_size, 16, "Should read the chunk size from the first channel")
+            self.assertEqual(tdms._data_type, 'int16', "Should read the data type from the first channel")
+        
+        self.assertEqual(list(props.keys()), [name for name, _ in self.props], "Should keep every property in order")
+        self.assertEqual(props['SamplingFrequency[Hz]'], 1000.0)
+        self.assertEqual(props['Description'], 'synthetic file')
+        self.assertEqual(props['Repeats'], 3)
+        self.assertEqual(props['GPSTimeStamp'], datetime.datetime(2021, 9, 9, 18, 16, 15))
+        
+        #the returned dict is a copy
+        props['Repeats'] = 4
+        self.assertEqual(tdms.get_properties()['Repeats'], 3)
+        
+    def test_float32_header(self):
+        data = np.zeros((10, 3), dtype=np.float32)
+        with TdmsReader(self.write(data, chunk_size=10, interleaved=True)) as tdms:
+            tdms.get_properties()
+            self.assertEqual(tdms._data_type, 'float32')
+            self.assertFalse(tdms.fileinfo['decimated'], "Interleaved data should not be flagged decimated")
+
+    def test_get_data_segments(self):
+        data = np.arange(1000 * 5, dtype=np.int16).reshape(1000, 5)
+        #segments of whole and partial chunks
+        fp = self.write(data, chunk_size=64, segment_lengths=[300, 128, 1, 571])
+        with TdmsReader(fp, use_index=False) as tdms:
+            self.assertEqual(tdms.channel_length, 1000, "Should count the samples of every segment")
+            self.assertEqual(len(tdms._segments), 4, "Should find 4 segments")
+            np.testing.assert_array_equal(tdms.get_data(), data)
+            #ranges are inclusive of the last channel and sample
+            np.testing.assert_array_equal(tdms.get_data(1, 3, 250, 700), data[250:701, 1:4])
+            np.testing.assert_array_equal(tdms.get_data(0, 4, 428, 428), data[428:429])
+            np.testing.assert_array_equal(tdms.get_data(2, None, 990, None), data[990:, 2:])
+            self.assertEqual(tdms.get_data(0, 4, 1000, None).shape, (0, 5))
+    
+    def test_get_data_interleaved(self):
+        data = np.random.default_rng(0).standard_normal((500, 7)).astype(np.float32)
+        with TdmsReader(self.write(data, chunk_size=100, interleaved=True, segment_lengths=[200, 300]), use_index=False) as tdms:
+            self.assertEqual(tdms.channel_length, 500)
+            np.testing.assert_array_equal(tdms.get_data(0, 6, 150, 349), data[150:350])
+    
+    def test_get_data_view(self):
+        data = np.arange(400 * 6, dtype=np.int16).reshape(400, 6)
+        with TdmsReader(self.write(data, chunk_size=100, segment_lengths=[250, 150]), use_index=False) as tdms:
+            #inside one chunk
+            view = tdms.get_data(1, 4, 110, 189, copy=False)
+            self.assertFalse(tdms.last_read_copied, "Should return a view inside one chunk")
+            self.assertFalse(view.flags.writeable)
+            np.testing.assert_array_equal(view, data[110:190, 1:5])
+            #across chunks and segments
+            np.testing.assert_array_equal(tdms.get_data(0, 5, 190, 260, copy=False), data[190:261])
+            self.assertTrue(tdms.last_read_copied, "Should copy across chunks")
+            tdms.get_data(0, 5, 0, 10)
+            self.assertTrue(tdms.last_read_copied, "Should copy by default")
+        
+        with TdmsReader(self.write(data, chunk_size=100, interleaved=True), use_index=False) as tdms:
+            np.testing.assert_array_equal(tdms.get_data(2, 3, 5, 350, copy=False), data[5:351, 2:4])
+            self.assertFalse(tdms.last_read_copied, "Should return a view inside an interleaved segment")
+    
+    def test_get_data_steps(self):
+        data = np.arange(1000 * 9, dtype=np.int16).reshape(1000, 9)
+        with TdmsReader(self.write(data, chunk_size=64, segment_lengths=[300, 700]), use_index=False) as tdms:
+            np.testing.assert_array_equal(tdms.get_data(1, 8, 5, 990, ch_step=3, s_step=7), data[5:991:7, 1:9:3])
+            #steps larger than a chunk skip whole chunks
+            np.testing.assert_array_equal(tdms.get_data(s_step=150), data[::150])
+            np.testing.assert_array_equal(tdms.get_data(0, 0, 3, None, channels=[8, 0, 4], s_step=2), data[3::2, [8, 0, 4]])
+            
+            view = tdms.get_data(0, None, 10, 60, copy=False, ch_step=2, s_step=5)
+            self.assertFalse(tdms.last_read_copied, "Should step through the view inside one chunk")
+            np.testing.assert_array_equal(view, data[10:61:5, ::2])
+            tdms.get_data(0, None, 10, 60, copy=False, channels=[1, 2])
+            self.assertTrue(tdms.last_read_copied, "Should copy lists of channels")
+            
+            with self.assertRaises(ValueError):
+                tdms.get_data(s_step=0)
+    
+    def test_iter_blocks(self):
+        data = np.arange(1050 * 4, dtype=np.int16).reshape(1050, 4)
+        with TdmsReader(self.write(data, chunk_size=64, segment_lengths=[500, 550]), use_index=False) as tdms:
+            blocks = list(tdms.iter_blocks(200))
+            self.assertEqual([len(b) for b in blocks], [200] * 5 + [50], "Last block should hold the remainder")
+            np.testing.assert_array_equal(np.concatenate(blocks), data)
+            
+            blocks = list(tdms.iter_blocks(300, overlap=20, first_ch=1, last_ch=2, first_s=100, last_s=999))
+            np.testing.assert_array_equal(blocks[0], data[100:400, 1:3])
+            np.testing.assert_array_equal(blocks[1], data[380:700, 1:3])
+            np.testing.assert_array_equal(blocks[2], data[680:1000, 1:3])
+            
+            blocks = list(tdms.iter_blocks(500, channels=[3, 0]))
+            np.testing.assert_array_equal(blocks[1], data[500:1000, [3, 0]])
+    
+    def test_segment_index(self):
+        data = np.arange(600 * 4, dtype=np.int16).reshape(600, 4)
+        fp = self.write(data, chunk_size=50, segment_lengths=[200, 400])
+        with TdmsReader(fp) as tdms:
+            self.assertEqual(tdms.channel_length, 600)
+            segments = tdms._segments
+        self.assertTrue(os.path.exists(fp + '.index.json'), "Should write the index file")
+        
+        #reopening uses the index instead of walking the segments
+        with TdmsReader(fp) as tdms:
+            def no_scan():
+                raise AssertionError("Should not walk the segments")
+            tdms._scan_segments = no_scan
+            np.testing.assert_array_equal(tdms.get_data(), data)
+            self.assertEqual(tdms._segments, segments)
+        
+        #an out of date index is not used
+        write_tdms(fp, data[:300], self.props, 50, segment_lengths=[100, 100, 100])
+        with TdmsReader(fp) as tdms:
+            self.assertEqual(tdms.channel_length, 300)
+            self.assertEqual(len(tdms._segments), 3)
+            np.testing.assert_array_equal(tdms.get_data(), data[:300])
+
+    
+if __name__ == '__main__':
+    unittest.main()